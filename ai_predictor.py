@@ -1,21 +1,85 @@
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
 import random
+import time
+from forecast_cache import ForecastCache
+from historical_store import rows_to_columns
+from model_registry import GLOBAL_KEY, build_design, crop_key, fit_registry
+from prediction_series import DEMAND, DEMAND_PERCENTAGE, NO_EVENTS, PRICE, PRICE_PERCENTAGE, PredictionSeries
+from simulation import Simulation
+
+MONTHS = list(range(1, 13))
+
+class ModelNotReadyError(Exception):
+    """Raised when a prediction is requested before any model has been trained"""
+
+class ModelBundle:
+    """Immutable set of per-series model coefficients, published to request handlers as a unit"""
+    __slots__ = ('version', 'demand_coef', 'price_coef', 'base_values', 'series_keys', 'series_rows',
+                 'base_year', 'trained_at', 'training_duration', 'training_rows', 'data_fingerprint')
+    
+    def __init__(self, version, demand_coef, price_coef, base_values, series_keys, base_year,
+                 trained_at, training_duration, training_rows, data_fingerprint=None):
+        self.version = version
+        # (n_series x n_features) coefficient matrices, one row per series
+        self.demand_coef = demand_coef
+        self.price_coef = price_coef
+        # (n_series x 2) array of mean demand and price per series
+        self.base_values = base_values
+        self.series_keys = series_keys
+        self.series_rows = {key: row for row, key in enumerate(series_keys)}
+        self.base_year = base_year
+        self.trained_at = trained_at
+        self.training_duration = training_duration
+        self.training_rows = training_rows
+        self.data_fingerprint = data_fingerprint
+    
+    def resolve_row(self, regions, crop):
+        """Find the most specific model for a crop: series, then crop-level, then global"""
+        for region in regions:
+            row = self.series_rows.get(f"{region}_{crop}")
+            if row is not None:
+                return row
+        
+        row = self.series_rows.get(crop_key(crop))
+        return row if row is not None else self.series_rows[GLOBAL_KEY]
+    
+    def forecast(self, rows, year):
+        """Predict 12 months of demand and price for many series with one matrix product each"""
+        design_t = build_design(np.arange(1, 13), year - self.base_year).T
+        return self.demand_coef[rows] @ design_t, self.price_coef[rows] @ design_t
+    
+    def get_base_values(self, row):
+        """Get the mean demand and price a model row was trained on"""
+        return float(self.base_values[row, 0]), float(self.base_values[row, 1])
+    
+    def describe(self):
+        """Get version and training metadata for status responses"""
+        return {
+            'version': self.version,
+            'trained_at': self.trained_at.isoformat(),
+            'training_duration_ms': round(self.training_duration * 1000, 2),
+            'training_rows': self.training_rows,
+            'series_models': len(self.series_keys)
+        }
 
 class AIPredictor:
-    def __init__(self):
-        self.scaler = StandardScaler()
-        self.demand_model = LinearRegression()
-        self.price_model = LinearRegression()
+    def __init__(self, simulation=None):
+        # Variation is a function of (series, model version, calendar month), not a fresh draw
+        self.simulation = simulation or Simulation()
         self.current_year = datetime.now().year
         self.current_month = datetime.now().month
+        self.forecast_cache = ForecastCache()
         
-        # Initialize with some base data for different crops and districts
-        self.base_data = self._initialize_base_data()
-        self._train_models()
+        # Request handlers read the active bundle without locking; it is only ever replaced whole
+        self.bundle = None
+    
+    @property
+    def model_version(self):
+        """Version of the active model bundle, or None before the first training run"""
+        bundle = self.bundle
+        return bundle.version if bundle is not None else None
     
     def _initialize_base_data(self):
         """Initialize base historical data for training"""
@@ -44,160 +108,184 @@ class AIPredictor:
                         'year': self.current_year - 1
                     })
                 
-                data[f"{district}_{crop}"] = monthly_data
+                data[f"{district}_{crop}"] = rows_to_columns(monthly_data)
         
         return data
     
-    def _train_models(self):
-        """Train the AI models with historical data"""
-        all_features = []
-        all_demands = []
-        all_prices = []
-        
-        for key, monthly_data in self.base_data.items():
-            for data_point in monthly_data:
-                # Features: month, seasonal patterns, trend
-                features = [
-                    data_point['month'],
-                    np.sin(2 * np.pi * data_point['month'] / 12),
-                    np.cos(2 * np.pi * data_point['month'] / 12),
-                    data_point['year']
-                ]
-                
-                all_features.append(features)
-                all_demands.append(data_point['demand'])
-                all_prices.append(data_point['price'])
+    def train(self, training_data=None, data_fingerprint=None):
+        """Train on {key: columns} history and publish the resulting bundle"""
+        if not training_data:
+            training_data = self._initialize_base_data()
         
-        X = np.array(all_features)
-        self.scaler.fit(X)
-        X_scaled = self.scaler.transform(X)
+        bundle = self._train_models(training_data)
+        bundle.data_fingerprint = data_fingerprint
+        self.publish(bundle)
+        return bundle
+    
+    def publish(self, bundle):
+        """Atomically switch request handlers over to a new model bundle"""
+        self.bundle = bundle
+        # Cached forecasts belong to the previous model
+        self.forecast_cache.clear()
+    
+    def _train_models(self, training_data):
+        """Train one model per series, plus crop-level and global fallbacks"""
+        started = time.perf_counter()
+        base_year = self.current_year - 1
+        series_keys, demand_coef, price_coef, base_values = fit_registry(training_data, base_year)
         
-        self.demand_model.fit(X_scaled, all_demands)
-        self.price_model.fit(X_scaled, all_prices)
+        trained_at = datetime.now()
+        return ModelBundle(
+            version=trained_at.strftime('%Y%m%dT%H%M%S%f'),
+            demand_coef=demand_coef,
+            price_coef=price_coef,
+            base_values=base_values,
+            series_keys=series_keys,
+            base_year=base_year,
+            trained_at=trained_at,
+            training_duration=time.perf_counter() - started,
+            training_rows=sum(len(columns['month']) for columns in training_data.values())
+        )
     
-    def predict(self, district, crop):
-        """Generate full year prediction for demand and price"""
-        key = f"{district}_{crop}"
-        
-        # Get base data if available, otherwise use average
-        if key in self.base_data:
-            base_data = self.base_data[key]
-            base_demand = np.mean([d['demand'] for d in base_data])
-            base_price = np.mean([d['price'] for d in base_data])
-        else:
-            base_demand = 2500
-            base_price = 50
-        
-        demand_data = []
-        price_data = []
-        events = []
-        
-        for month in range(1, 13):
-            # Prepare features for prediction
-            features = np.array([[
-                month,
-                np.sin(2 * np.pi * month / 12),
-                np.cos(2 * np.pi * month / 12),
-                self.current_year
-            ]])
-            
-            features_scaled = self.scaler.transform(features)
-            
-            # Predict using AI models
-            predicted_demand = self.demand_model.predict(features_scaled)[0]
-            predicted_price = self.price_model.predict(features_scaled)[0]
-            
-            # Add some realistic variations
-            demand_variation = random.uniform(0.95, 1.05)
-            price_variation = random.uniform(0.95, 1.05)
-            
-            final_demand = predicted_demand * demand_variation
-            final_price = predicted_price * price_variation
-            
-            # Determine if this is historical or predicted
-            is_historical = month < self.current_month
+    def refresh_calendar(self):
+        """Roll the current month forward, invalidating cached forecasts on change"""
+        now = datetime.now()
+        if (now.year, now.month) != (self.current_year, self.current_month):
+            self.current_year = now.year
+            self.current_month = now.month
+            self.forecast_cache.clear()
+    
+    def _get_base_forecasts(self, bundle, items):
+        """Get cached model forecasts for many series, computing all misses in one pass"""
+        forecasts = [None] * len(items)
+        missing = []
+        
+        for i, item in enumerate(items):
+            location, crop = item[0], item[1]
+            forecasts[i] = self.forecast_cache.get((location, crop, bundle.version, self.current_month))
+            if forecasts[i] is None:
+                missing.append(i)
+        
+        if missing:
+            rows = [
+                bundle.resolve_row(items[i][2] if len(items[i]) > 2 and items[i][2] else [items[i][0]], items[i][1])
+                for i in missing
+            ]
+            predicted_demand, predicted_price = bundle.forecast(rows, self.current_year)
             
-            demand_data.append({
-                'month': month,
-                'value': round(final_demand, 2),
-                'percentage': round((final_demand / base_demand) * 100, 2),
-                'is_historical': is_historical,
-                'event': None
-            })
+            # Forecasts are shared through the cache, so keep them read-only
+            predicted_demand.setflags(write=False)
+            predicted_price.setflags(write=False)
             
-            price_data.append({
-                'month': month,
-                'value': round(final_price, 2),
-                'percentage': round((final_price / base_price) * 100, 2),
-                'is_historical': is_historical,
-                'event': None
-            })
+            for n, i in enumerate(missing):
+                location, crop = items[i][0], items[i][1]
+                base_demand, base_price = bundle.get_base_values(rows[n])
+                forecasts[i] = (predicted_demand[n], predicted_price[n], base_demand, base_price)
+                self.forecast_cache.put((location, crop, bundle.version, self.current_month), forecasts[i])
         
-        return {
-            'district': district,
-            'crop': crop,
-            'year': self.current_year,
-            'current_month': self.current_month,
-            'demand_data': demand_data,
-            'price_data': price_data,
-            'base_demand': base_demand,
-            'base_price': base_price,
-            'last_updated': datetime.now().isoformat()
-        }
+        return forecasts
     
-    def get_updated_prediction(self, district, crop, events):
-        """Update prediction with new events and data"""
-        prediction = self.predict(district, crop)
-        
-        # Apply event-based adjustments
-        for event in events:
-            if event['type'] == 'disaster':
-                # Increase demand, increase price
-                for i in range(self.current_month - 1, 12):
-                    if not prediction['demand_data'][i]['is_historical']:
-                        prediction['demand_data'][i]['value'] *= 1.2
-                        prediction['demand_data'][i]['percentage'] *= 1.2
-                        prediction['demand_data'][i]['event'] = event['name']
-                        
-                        prediction['price_data'][i]['value'] *= 1.3
-                        prediction['price_data'][i]['percentage'] *= 1.3
-                        prediction['price_data'][i]['event'] = event['name']
-            
-            elif event['type'] == 'economic':
-                # Affect prices more than demand
-                for i in range(self.current_month - 1, 12):
-                    if not prediction['price_data'][i]['is_historical']:
-                        prediction['price_data'][i]['value'] *= event.get('impact', 1.1)
-                        prediction['price_data'][i]['percentage'] *= event.get('impact', 1.1)
-                        prediction['price_data'][i]['event'] = event['name']
+    def predict(self, district, crop, regions=None):
+        """Generate full year prediction for demand and price"""
+        return self.predict_batch([(district, crop, regions)])[0]
+    
+    def predict_batch(self, items, impacts=None):
+        """Generate full year PredictionSeries for a list of (location, crop[, regions]) items
+        
+        `regions` lists the names to look the series model up by, most specific
+        first (e.g. city, district, state), and defaults to the location itself.
+        `impacts` optionally carries per-item event multipliers and labels from
+        NewsMonitor.get_event_impacts.
+        """
+        bundle = self.bundle
+        if bundle is None:
+            raise ModelNotReadyError("Model is still training, retry shortly")
+        
+        self.refresh_calendar()
+        if not items:
+            return []
+        
+        base_forecasts = self._get_base_forecasts(bundle, items)
+        last_updated = datetime.now().isoformat()
         
-        prediction['last_updated'] = datetime.now().isoformat()
-        return prediction
+        # Work on (n_items x 12) matrices so jitter and events are single array operations
+        predicted_demand = np.vstack([forecast[0] for forecast in base_forecasts])
+        predicted_price = np.vstack([forecast[1] for forecast in base_forecasts])
+        base_demands = [forecast[2] for forecast in base_forecasts]
+        base_prices = [forecast[3] for forecast in base_forecasts]
+        
+        # Add some realistic variations, identical on every refresh so diffs only carry real changes
+        # Keyed by region names, not location IDs, which can differ between processes
+        sim = self.simulation
+        paths = ['|'.join(map(str, item[2] if len(item) > 2 and item[2] else [item[0]])) for item in items]
+        series = sim.row_entities(paths, [item[1] for item in items], [bundle.version] * len(items))
+        month_keys = sim.extend(series, MONTHS)
+        bucket = self.current_year * 12 + self.current_month
+        final_demand = predicted_demand * (0.95 + sim.uniform('prediction.demand', month_keys, bucket) * 0.1)
+        final_price = predicted_price * (0.95 + sim.uniform('prediction.price', month_keys, bucket) * 0.1)
+        
+        if impacts is not None:
+            final_demand *= impacts['demand']
+            final_price *= impacts['price']
+        
+        # One (4 x 12) block per prediction: demand, demand %, price, price %
+        values = np.round(np.stack([
+            final_demand,
+            final_demand / np.array(base_demands)[:, None] * 100,
+            final_price,
+            final_price / np.array(base_prices)[:, None] * 100
+        ], axis=1), 2)
+        
+        predictions = []
+        for n, item in enumerate(items):
+            district, crop = item[0], item[1]
+            predictions.append(PredictionSeries(
+                district, crop, self.current_year, self.current_month, values[n].copy(),
+                base_demands[n], base_prices[n], bundle.version, last_updated,
+                impacts['demand_events'][n] if impacts is not None else NO_EVENTS,
+                impacts['price_events'][n] if impacts is not None else NO_EVENTS
+            ))
+        
+        return predictions
+    
+    def get_updated_prediction(self, district, crop, event_source, regions=None):
+        """Update prediction with new events and data"""
+        return self.get_updated_predictions([(district, crop, regions)], event_source)[0]
+    
+    def get_updated_predictions(self, items, event_source):
+        """Predict many series and apply only the events affecting each one"""
+        self.refresh_calendar()
+        impacts = event_source.get_event_impacts(
+            [(item[2] if len(item) > 2 and item[2] else [item[0]], item[1]) for item in items],
+            self.current_month
+        )
+        return self.predict_batch(items, impacts)
     
     def apply_manual_adjustment(self, prediction_data, month, demand_change, price_change):
-        """Apply manual adjustments for prototype demonstration"""
+        """Apply manual adjustments for prototype demonstration, returning an adjusted copy"""
+        prediction_data = prediction_data.copy()
         month_idx = month - 1
         
         if 0 <= month_idx < 12:
+            values = prediction_data.values
+            
             # Apply demand change
             if demand_change != 0:
-                old_demand = prediction_data['demand_data'][month_idx]['value']
-                new_demand = old_demand * (1 + demand_change / 100)
-                prediction_data['demand_data'][month_idx]['value'] = round(new_demand, 2)
-                prediction_data['demand_data'][month_idx]['percentage'] = round(
-                    (new_demand / prediction_data['base_demand']) * 100, 2
-                )
-                prediction_data['demand_data'][month_idx]['event'] = 'Manual Adjustment'
+                new_demand = values[DEMAND, month_idx] * (1 + demand_change / 100)
+                values[DEMAND, month_idx] = round(new_demand, 2)
+                values[DEMAND_PERCENTAGE, month_idx] = round((new_demand / prediction_data.base_demand) * 100, 2)
+                demand_events = list(prediction_data.demand_events)
+                demand_events[month_idx] = 'Manual Adjustment'
+                prediction_data.demand_events = tuple(demand_events)
             
             # Apply price change
             if price_change != 0:
-                old_price = prediction_data['price_data'][month_idx]['value']
-                new_price = old_price * (1 + price_change / 100)
-                prediction_data['price_data'][month_idx]['value'] = round(new_price, 2)
-                prediction_data['price_data'][month_idx]['percentage'] = round(
-                    (new_price / prediction_data['base_price']) * 100, 2
-                )
-                prediction_data['price_data'][month_idx]['event'] = 'Manual Adjustment'
-        
-        prediction_data['last_updated'] = datetime.now().isoformat()
-        return prediction_data
\ No newline at end of file
+                new_price = values[PRICE, month_idx] * (1 + price_change / 100)
+                values[PRICE, month_idx] = round(new_price, 2)
+                values[PRICE_PERCENTAGE, month_idx] = round((new_price / prediction_data.base_price) * 100, 2)
+                price_events = list(prediction_data.price_events)
+                price_events[month_idx] = 'Manual Adjustment'
+                prediction_data.price_events = tuple(price_events)
+        
+        prediction_data.last_updated = datetime.now().isoformat()
+        return prediction_data
@@ -0,0 +1,192 @@
+"""
+API Response - Fast JSON encoding, compression and conditional responses
+
+Installs a Flask JSON provider that uses orjson when it is installed (falling
+back to the stdlib json module) and encodes NumPy scalars and arrays natively.
+An after_request hook gzip- or brotli-compresses JSON responses above a size
+threshold and answers conditional GETs with 304 Not Modified. Static datasets
+can be wrapped in PrecomputedJSON so they are encoded, compressed and hashed
+once instead of on every request.
+"""
+import gzip
+import hashlib
+import json
+import zlib
+from datetime import date, datetime
+
+import numpy as np
+from flask import request
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies fit in one packet anyway and are not worth the CPU
+COMPRESS_MIN_BYTES = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson')
+
+
+def _default(obj):
+    """Encode types the stdlib json module does not know about"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Encode an object as compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def make_etag(body):
+    """Hash a response body into an ETag value"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def negotiate_encoding(accept_encodings):
+    """Pick the best content coding the client accepts, or None for identity"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by dumps()/loads()"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype='application/json')
+
+
+class PrecomputedJSON:
+    """A static payload encoded, compressed and hashed once"""
+
+    def __init__(self, payload, max_age=None, precompress=False):
+        self.body = dumps(payload)
+        self.etag = make_etag(self.body)
+        self.max_age = max_age
+        self._encoded = {}
+        if precompress:
+            for encoding in ('gzip', 'br') if brotli is not None else ('gzip',):
+                self.encoded(encoding)
+
+    def encoded(self, encoding):
+        """Get the body in a content coding, compressing it on first use"""
+        if encoding is None or len(self.body) < COMPRESS_MIN_BYTES:
+            return self.body, None
+        if encoding not in self._encoded:
+            self._encoded[encoding] = compress(self.body, encoding)
+        return self._encoded[encoding], encoding
+
+    def etag_for(self, encoding):
+        """Strong ETag of the body in a content coding; each coding is its own representation"""
+        return self.etag if encoding is None else f"{self.etag}-{encoding}"
+
+    def response(self, response_class):
+        """Build a response for the current request, honouring If-None-Match"""
+        body, encoding = self.encoded(negotiate_encoding(request.accept_encodings))
+        etag = self.etag_for(encoding)
+        if request.if_none_match.contains_weak(etag):
+            response = response_class(status=304)
+        else:
+            response = response_class(body, mimetype='application/json')
+            if encoding is not None:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        if self.max_age is not None:
+            response.cache_control.public = True
+            response.cache_control.max_age = self.max_age
+        return response
+
+
+def _compress_chunks(chunks, encoding):
+    """Compress a byte stream incrementally, flushing after every chunk"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        # wbits=31 writes a gzip header and trailer
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def stream_response(response_class, chunks, mimetype='application/x-ndjson'):
+    """Stream byte chunks, compressing them on the fly if the client accepts it"""
+    encoding = negotiate_encoding(request.accept_encodings)
+    response = response_class(_compress_chunks(chunks, encoding) if encoding else chunks, mimetype=mimetype)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def finalize_response(response):
+    """Add an ETag, answer conditional GETs and compress large JSON bodies"""
+    # Streamed and precomputed responses handle their own encoding and validators
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200 or
+            response.mimetype not in COMPRESSIBLE_MIMETYPES or
+            'Content-Encoding' in response.headers or 'ETag' in response.headers):
+        return response
+
+    body = response.get_data()
+    if request.method in ('GET', 'HEAD'):
+        # Weak, because the compressed and identity bodies share one validator
+        response.set_etag(make_etag(body), weak=True)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is not None and len(body) >= COMPRESS_MIN_BYTES:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Install the fast JSON provider and the compression/ETag hook on an app"""
+    app.json = FastJSONProvider(app)
+    app.after_request(finalize_response)
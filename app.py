@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
@@ -7,46 +7,110 @@ import threading
 import time
 import schedule
 from data_manager import DataManager
-from ai_predictor import AIPredictor
+from ai_predictor import AIPredictor, ModelNotReadyError
+from model_trainer import ModelTrainer
 from news_monitor import NewsMonitor
-from location_data import get_states, get_districts, get_cities, get_all_locations
+from prediction_refresher import PredictionRefresher
+from state_store import create_state_store, worker_id
+from push_channel import MAX_TOPICS, PushBroker, is_valid_topic, prediction_message, prediction_topic
 from dashboard_service import DashboardService
+from dashboard_summary import DashboardSummary
+from data_providers import create_providers
+from region_snapshot import SNAPSHOT_INTERVAL_SECONDS
+from ingest_parser import detect_format, parse_ingest_payload
+from api_response import dumps, init_app, stream_response
+from catalog import CatalogResponses
+from id_registry import registry
+from location_search import LEVELS
+from batch_predict import BATCH_CHUNK_SIZE, BatchTooLargeError, iter_batch_items, validate_batch_request
 
 app = Flask(__name__)
 CORS(app)
+init_app(app)
 
 # Initialize components
 data_manager = DataManager()
 ai_predictor = AIPredictor()
-news_monitor = NewsMonitor()
-dashboard_service = DashboardService()
+model_trainer = ModelTrainer(ai_predictor, data_manager)
+# News, weather and mandi feeds (DATA_PROVIDER); without them everything is simulated
+data_providers = create_providers(data_manager.data_dir)
+if data_providers is not None:
+    data_providers.start()
+news_monitor = NewsMonitor(data_providers)
+dashboard_service = DashboardService(providers=data_providers)
+dashboard_summary = DashboardSummary(dashboard_service)
 
-# Global variables for real-time updates
-current_data = {}
-last_update = datetime.now()
+# Location and crop catalogs, encoded and compressed once per source version
+catalog = CatalogResponses(dashboard_service)
+
+# Active predictions, shared by all workers when STATE_BACKEND=sqlite
+state_store = create_state_store(data_manager.data_dir)
+# Prediction diffs and alerts for /api/stream subscribers, read from the shared event log
+push_broker = PushBroker(state_store)
+push_broker.start()
+prediction_refresher = PredictionRefresher(ai_predictor, news_monitor, state_store, push_broker=push_broker)
 
 def update_predictions():
     """Update predictions every 5 minutes"""
-    global current_data, last_update
     print(f"Updating predictions at {datetime.now()}")
-    
-    # Check for news events that might affect predictions
-    events = news_monitor.check_events()
-    
-    # Update all active predictions
-    for key in current_data:
-        district, crop = key.split('_')
-        current_data[key] = ai_predictor.get_updated_prediction(district, crop, events)
-    
-    last_update = datetime.now()
+    try:
+        stats = prediction_refresher.refresh()
+        print(f"Refreshed {stats['series_touched']} of {stats['series_total']} predictions in {stats['duration_ms']}ms")
+    except Exception as e:
+        print(f"Prediction refresh failed: {e}")
+
+def refresh_catalogs():
+    """Rebuild static aggregates and catalog responses whose source data changed"""
+    dashboard_service.crop_distribution.refresh()
+    catalog.refresh()
+
+def refresh_dashboard_snapshots():
+    """Rebuild the per-region market and weather snapshots"""
+    try:
+        dashboard_service.refresh_snapshots()
+    except Exception as e:
+        print(f"Dashboard snapshot refresh failed: {e}")
+
+def reload_historical_data():
+    """Pick up the latest compacted snapshot and every worker's logged data points"""
+    try:
+        data_manager.reload_historical_data()
+    except Exception as e:
+        print(f"Historical data reload failed: {e}")
 
 def run_scheduler():
     """Run the scheduler in a separate thread"""
-    schedule.every(5).minutes.do(update_predictions)
+    # Shared work runs only in the elected leader; every worker retrains its own models
+    leader_schedule = schedule.Scheduler()
+    leader_schedule.every(5).minutes.do(update_predictions)
+    leader_schedule.every(30).minutes.do(data_manager.compact_historical_data)
+    # Every worker reloads, so rows ingested through other workers reach its training data
+    schedule.every(5).minutes.do(reload_historical_data)
+    schedule.every(6).hours.do(model_trainer.trigger)
+    schedule.every(5).minutes.do(refresh_catalogs)
+    schedule.every(5).minutes.do(dashboard_service.price_ranking.refresh)
+    schedule.every(SNAPSHOT_INTERVAL_SECONDS).seconds.do(refresh_dashboard_snapshots)
+    
+    owner = worker_id()
+    is_leader = False
     while True:
+        try:
+            was_leader, is_leader = is_leader, state_store.acquire_leadership(owner)
+        except Exception as e:
+            print(f"Leader election failed: {e}")
+            was_leader, is_leader = is_leader, False
+        
+        if is_leader and not was_leader:
+            print(f"Worker {owner} is now the scheduler leader")
+            prediction_refresher.invalidate()
+        if is_leader:
+            leader_schedule.run_pending()
         schedule.run_pending()
         time.sleep(1)
 
+# Train models in the background; /api/predict returns 503 until the first bundle is ready
+model_trainer.start()
+
 # Start scheduler thread
 scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
 scheduler_thread.start()
@@ -54,32 +118,47 @@ scheduler_thread.start()
 @app.route('/api/locations/states', methods=['GET'])
 def get_states_list():
     """Get all Indian states"""
-    return jsonify({'states': get_states()})
+    return catalog.response(app.response_class, 'states')
 
 @app.route('/api/locations/districts/<string:state>', methods=['GET'])
 def get_districts_list(state):
     """Get districts for a state"""
-    districts = get_districts(state)
-    return jsonify({'districts': districts})
+    return catalog.response(app.response_class, 'districts', state)
 
 @app.route('/api/locations/cities/<string:state>/<string:district>', methods=['GET'])
 def get_cities_list(state, district):
     """Get cities for a state and district"""
-    cities = get_cities(state, district)
-    return jsonify({'cities': cities})
+    return catalog.response(app.response_class, 'cities', state, district)
 
 @app.route('/api/locations/all', methods=['GET'])
 def get_all_locations_data():
     """Get all locations in hierarchical format"""
-    return jsonify({'locations': get_all_locations()})
+    return catalog.response(app.response_class, 'locations')
+
+@app.route('/api/locations/search', methods=['GET'])
+def search_locations():
+    """Type-ahead search over states, districts and cities"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    
+    limit = request.args.get('limit', 10, type=int)
+    level = request.args.get('type')
+    if level is not None and level not in LEVELS:
+        return jsonify({'error': f"type must be one of: {', '.join(LEVELS)}"}), 400
+    
+    # fold=0 switches to case- and diacritic-sensitive matching
+    folded = request.args.get('fold', '1') != '0'
+    results = catalog.location_index.search(query, max(limit, 1), folded, level)
+    return jsonify({'query': query, 'results': results})
 
 @app.route('/api/dashboard/market-rates', methods=['GET'])
 def get_market_rates():
     """Get live market rates"""
     state = request.args.get('state')
     district = request.args.get('district')
-    rates = dashboard_service.get_live_market_rates(state, district)
-    return jsonify({'market_rates': rates})
+    rates, snapshot = dashboard_service.get_market_rates_snapshot(state, district)
+    return jsonify({'market_rates': rates, 'snapshot': snapshot})
 
 @app.route('/api/dashboard/crop-health', methods=['GET'])
 def get_crop_health():
@@ -96,8 +175,21 @@ def get_weather():
     state = request.args.get('state')
     district = request.args.get('district')
     city = request.args.get('city')
-    weather_data = dashboard_service.get_weather_data(state, district, city)
-    return jsonify({'weather': weather_data})
+    weather_data, snapshot = dashboard_service.get_weather_snapshot(state, district, city)
+    return jsonify({'weather': weather_data, 'snapshot': snapshot})
+
+@app.route('/api/dashboard/summary', methods=['GET'])
+def get_dashboard_summary():
+    """Get market rates, crop health, weather, alerts and top districts in one call"""
+    try:
+        state = request.args.get('state')
+        district = request.args.get('district')
+        city = request.args.get('city')
+        crop = request.args.get('crop')
+        k = request.args.get('k', 5, type=int)
+        return jsonify(dashboard_summary.get(state, district, city, crop, k))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/dashboard/alerts', methods=['GET'])
 def get_alerts():
@@ -107,21 +199,57 @@ def get_alerts():
 
 @app.route('/api/dashboard/top-districts', methods=['GET'])
 def get_top_districts():
-    """Get top 5 districts with highest prices for a crop in a state"""
+    """Get top k (default 5) districts with highest prices for a crop in a state"""
     state = request.args.get('state')
     crop = request.args.get('crop')
     
     if not state or not crop:
         return jsonify({'error': 'State and crop are required'}), 400
     
-    top_districts = dashboard_service.get_top_districts_by_price(state, crop)
+    k = request.args.get('k', 5, type=int)
+    top_districts = dashboard_service.get_top_districts_by_price(state, crop, k)
     return jsonify({'top_districts': top_districts})
 
+@app.route('/api/dashboard/price-rankings', methods=['GET'])
+def get_price_rankings():
+    """Get top k districts by price for many crops at once, per state or national"""
+    state = request.args.get('state')
+    crops = [crop for crop in request.args.get('crops', '').split(',') if crop] or None
+    k = request.args.get('k', 5, type=int)
+    
+    rankings = dashboard_service.get_price_rankings(state, crops, k)
+    return jsonify({'state': state, 'k': k, 'rankings': rankings})
+
 @app.route('/api/dashboard/tamilnadu-crops', methods=['GET'])
 def get_tamilnadu_crops():
     """Get Tamil Nadu district-wise crop distribution"""
-    crop_data = dashboard_service.get_tamilnadu_crop_distribution()
-    return jsonify({'tamilnadu_crops': crop_data})
+    return catalog.response(app.response_class, 'tamilnadu_crops')
+
+@app.route('/api/dashboard/crop-distribution', methods=['GET'])
+def get_crop_distribution():
+    """Get district-wise crop distribution and area-weighted totals for a state"""
+    state = request.args.get('state')
+    if not state:
+        return jsonify({'error': 'State is required'}), 400
+    
+    try:
+        distribution = dashboard_service.get_crop_distribution(
+            state,
+            crop=request.args.get('crop'),
+            dominant=request.args.get('dominant'),
+            sort=request.args.get('sort', 'dominant_percentage'),
+            descending=request.args.get('order', 'desc') != 'asc',
+            limit=request.args.get('limit', type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if distribution is None:
+        return jsonify({
+            'error': f"No crop distribution data for {state}",
+            'available_states': list(dashboard_service.crop_distribution.states)
+        }), 404
+    return jsonify(distribution)
 
 @app.route('/api/predict', methods=['POST'])
 def predict_crop():
@@ -137,22 +265,88 @@ def predict_crop():
             return jsonify({'error': 'State, district, city and crop are required'}), 400
         
         # Generate prediction using city as location identifier
-        location_key = f"{state}-{district}-{city}"
-        prediction_data = ai_predictor.predict(location_key, crop)
-        prediction_data['state'] = state
-        prediction_data['district'] = district
-        prediction_data['city'] = city
+        key = registry.series_key(state, district, city, crop)
+        prediction_data = ai_predictor.predict(key[:3], crop, [city, district, state])
+        prediction_data.set_location(state, district, city)
         
         # Store in global data for updates
-        key = f"{location_key}_{crop}"
-        current_data[key] = prediction_data
+        prediction_refresher.put(key, prediction_data)
         
         return jsonify({
             'success': True,
-            'data': prediction_data,
-            'last_update': last_update.isoformat()
+            'data': prediction_data.render(request.args.get('format')),
+            'last_update': prediction_refresher.last_update
         })
     
+    except ModelNotReadyError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_crop_batch():
+    """Predict many state/district/city/crop combinations, streamed back as NDJSON"""
+    try:
+        data = request.get_json(silent=True)
+        crop_list = data_manager.get_crop_list()
+        try:
+            validate_batch_request(data, crop_list)
+        except BatchTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if ai_predictor.bundle is None:
+            return jsonify({'error': 'Model is still training, retry shortly'}), 503
+        
+        track = bool(data.get('track'))
+        data_format = request.args.get('format')
+        
+        def predict_chunk(chunk):
+            """Run one vectorized pass and render its NDJSON lines"""
+            names = [(item['state'], item['district'], item['city'], item['crop']) for _, item in chunk]
+            if track:
+                keys = [registry.series_key(*series) for series in names]
+            else:
+                # Untracked batches may name anything, so they must not grow the registry;
+                # the location only keys the forecast cache, so unknown names key it by name
+                keys = [registry.find_series_key(*series) for series in names]
+            items = [(key[:3] if key is not None else series[:3], series[3], [series[2], series[1], series[0]])
+                     for key, series in zip(keys, names)]
+            lines = []
+            tracked = []
+            for (index, item), key, prediction in zip(chunk, keys, ai_predictor.predict_batch(items)):
+                prediction.set_location(item['state'], item['district'], item['city'])
+                if track:
+                    tracked.append((key, prediction))
+                lines.append(dumps({'index': index, 'data': prediction.render(data_format)}) + b'\n')
+            # One store write per chunk rather than per item
+            if tracked:
+                prediction_refresher.put_many(tracked)
+            return b''.join(lines)
+        
+        def generate():
+            count = 0
+            errors = 0
+            chunk = []
+            for index, item, error in iter_batch_items(data, crop_list):
+                if error is not None:
+                    errors += 1
+                    yield dumps({'index': index, 'error': error}) + b'\n'
+                    continue
+                chunk.append((index, item))
+                if len(chunk) >= BATCH_CHUNK_SIZE:
+                    count += len(chunk)
+                    yield predict_chunk(chunk)
+                    chunk = []
+            if chunk:
+                count += len(chunk)
+                yield predict_chunk(chunk)
+            # A trailing summary lets clients tell a complete stream from a truncated one
+            yield dumps({'summary': {'predictions': count, 'errors': errors}}) + b'\n'
+        
+        return stream_response(app.response_class, stream_with_context(generate()))
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -169,16 +363,19 @@ def manual_adjust():
         demand_change = data.get('demand_change', 0)
         price_change = data.get('price_change', 0)
         
-        location_key = f"{state}-{district}-{city}"
-        key = f"{location_key}_{crop}"
-        if key in current_data:
-            current_data[key] = ai_predictor.apply_manual_adjustment(
-                current_data[key], month, demand_change, price_change
-            )
+        key = registry.find_series_key(state, district, city, crop)
+        prediction = prediction_refresher.get(key) if key is not None else None
+        if prediction is not None:
+            # The adjustment works on a copy, so readers of the current snapshot never see a half-applied change
+            adjusted = ai_predictor.apply_manual_adjustment(prediction, month, demand_change, price_change)
+            prediction_refresher.put(key, adjusted)
+            message = prediction_message(adjusted, prediction, 'manual_adjust')
+            if message is not None:
+                push_broker.publish([message])
             
             return jsonify({
                 'success': True,
-                'data': current_data[key]
+                'data': adjusted.render(request.args.get('format'))
             })
         else:
             return jsonify({'error': 'No active prediction found'}), 404
@@ -186,6 +383,42 @@ def manual_adjust():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ingest', methods=['POST'])
+def ingest_data():
+    """Bulk ingest of district/crop demand and price records as NDJSON or CSV"""
+    try:
+        data_format = detect_format(request.content_type, request.args.get('format'))
+        if data_format not in ('ndjson', 'csv'):
+            return jsonify({'error': 'Payload must be NDJSON or CSV (set Content-Type or ?format=ndjson|csv)'}), 415
+        
+        try:
+            records, errors = parse_ingest_payload(request.get_data(as_text=True), data_format)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 413
+        
+        if not records:
+            return jsonify({
+                'success': False,
+                'error': 'No valid records found',
+                'accepted': 0,
+                'rejected': len(errors),
+                'errors': errors
+            }), 400
+        
+        series_count = data_manager.append_records(records, sync=True)
+        model_trainer.notify_ingest(len(records))
+        
+        return jsonify({
+            'success': True,
+            'accepted': len(records),
+            'rejected': len(errors),
+            'series': series_count,
+            'errors': errors
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/events', methods=['GET'])
 def get_events():
     """Get current events affecting predictions"""
@@ -198,13 +431,48 @@ def get_events():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stream', methods=['GET'])
+def stream_updates():
+    """Server-sent events for subscribed prediction and alert topics"""
+    topics = [topic for value in request.args.getlist('topic') for topic in value.split(',') if topic]
+    # state/district/city/crop is shorthand for one prediction topic
+    names = [request.args.get(name) for name in ('state', 'district', 'city', 'crop')]
+    if all(names):
+        topics.append(prediction_topic(*names))
+    
+    if not topics:
+        return jsonify({'error': 'Subscribe with topic=alerts, topic=prediction:state|district|city|crop '
+                                 'or state, district, city and crop'}), 400
+    invalid = [topic for topic in topics if not is_valid_topic(topic)]
+    if invalid:
+        return jsonify({'error': f"Invalid topics: {', '.join(invalid)}"}), 400
+    if len(set(topics)) > MAX_TOPICS:
+        return jsonify({'error': f"At most {MAX_TOPICS} topics per connection"}), 400
+    
+    # Reconnecting clients resume from the last event they saw
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id', ''))
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else None
+    response = app.response_class(
+        stream_with_context(push_broker.stream(topics, last_event_id)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'last_update': last_update.isoformat(),
-        'active_predictions': len(current_data)
+        'last_update': prediction_refresher.last_update,
+        'active_predictions': len(prediction_refresher),
+        'refresh': prediction_refresher.stats(),
+        'model': model_trainer.describe(),
+        'forecast_cache': ai_predictor.forecast_cache.stats(),
+        'providers': dashboard_service.get_provider_stats(),
+        'push': push_broker.stats()
     })
 
 if __name__ == '__main__':
@@ -0,0 +1,115 @@
+"""
+Batch Predict - Expands /api/predict/batch requests into prediction items
+
+A request is either an explicit list of {state, district, city, crop} items or
+a cross-product spec: one state, plus districts, cities and crops that are
+each a list or "all". Items are produced lazily so large cross products never
+sit in memory at once.
+"""
+from location_data import get_states, get_districts, get_cities
+
+ALL = 'all'
+
+# Largest number of predictions one batch request may ask for
+MAX_BATCH_ITEMS = 50000
+
+# Predictions computed per vectorized pass
+BATCH_CHUNK_SIZE = 500
+
+REQUIRED_FIELDS = ['state', 'district', 'city', 'crop']
+
+
+class BatchTooLargeError(ValueError):
+    """Raised when a batch request expands past MAX_BATCH_ITEMS"""
+
+
+def _select(value, available, field):
+    """Resolve a list-or-"all" selector against the available names"""
+    if value is None or value == ALL:
+        return available
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ValueError(f"'{field}' must be a list of names or \"{ALL}\"")
+    return value
+
+
+def _unknown(names, available):
+    """Names not among the available ones, in request order"""
+    available = set(available)
+    return [name for name in names if name not in available]
+
+
+def _expand_spec(spec, crop_list):
+    """Build (districts, cities per district, crops) for a cross-product spec"""
+    state = spec.get('state')
+    if not state:
+        raise ValueError("A cross-product spec needs a 'state'")
+    if state not in get_states():
+        raise ValueError(f"Unknown state '{state}'")
+
+    crops = _select(spec.get('crops'), crop_list, 'crops')
+    districts = _select(spec.get('districts'), get_districts(state), 'districts')
+    # Unknown names would silently expand to zero items, so name them instead
+    unknown_districts = _unknown(districts, get_districts(state))
+    if unknown_districts:
+        raise ValueError(f"Unknown districts in {state}: {', '.join(unknown_districts)}")
+    # An explicit city list is shared by all districts, so each keeps only its own cities
+    cities = {}
+    for district in districts:
+        available = get_cities(state, district)
+        selected = _select(spec.get('cities'), available, 'cities')
+        known = set(available)
+        cities[district] = [city for city in selected if city in known]
+    if spec.get('cities') not in (None, ALL):
+        unknown_cities = _unknown(spec['cities'], [city for district in districts for city in cities[district]])
+        if unknown_cities:
+            raise ValueError(f"Unknown cities in the selected districts of {state}: {', '.join(unknown_cities)}")
+    return state, districts, cities, crops
+
+
+def count_batch_items(data, crop_list):
+    """Count how many items a batch request expands to"""
+    if 'items' in data:
+        return len(data['items'])
+
+    state, districts, cities, crops = _expand_spec(data, crop_list)
+    return sum(len(cities[district]) for district in districts) * len(crops)
+
+
+def iter_batch_items(data, crop_list):
+    """Yield (index, item, error) for every requested prediction"""
+    if 'items' in data:
+        for index, raw in enumerate(data['items']):
+            if not isinstance(raw, dict):
+                yield index, None, 'Item must be an object'
+                continue
+            missing = [field for field in REQUIRED_FIELDS if not raw.get(field)]
+            if missing:
+                yield index, None, f"Missing required fields: {', '.join(missing)}"
+                continue
+            invalid = [field for field in REQUIRED_FIELDS if not isinstance(raw[field], str)]
+            if invalid:
+                yield index, None, f"Fields must be strings: {', '.join(invalid)}"
+                continue
+            yield index, {field: raw[field] for field in REQUIRED_FIELDS}, None
+        return
+
+    state, districts, cities, crops = _expand_spec(data, crop_list)
+    index = 0
+    for district in districts:
+        for city in cities[district]:
+            for crop in crops:
+                yield index, {'state': state, 'district': district, 'city': city, 'crop': crop}, None
+                index += 1
+
+
+def validate_batch_request(data, crop_list):
+    """Check a batch request's shape and size, returning its item count"""
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    if 'items' in data and not isinstance(data['items'], list):
+        raise ValueError("'items' must be a list")
+
+    count = count_batch_items(data, crop_list)
+    if count > MAX_BATCH_ITEMS:
+        raise BatchTooLargeError(f"Batch expands to {count} predictions, the limit is {MAX_BATCH_ITEMS}")
+    return count
@@ -0,0 +1,70 @@
+"""
+Catalog - Precompiled location and crop catalog responses
+
+The location hierarchy and crop distribution only change when their source
+data does, so every catalog response is encoded, compressed and given a strong
+ETag once per source version, and the location search index is rebuilt with
+them. refresh() fingerprints the sources and rebuilds
+the blobs only when the fingerprint changes, which also changes every ETag.
+"""
+import hashlib
+
+from api_response import PrecomputedJSON, dumps
+from crop_data import TAMIL_NADU_CROP_DATA
+from location_data import INDIAN_LOCATIONS, get_all_locations, get_cities, get_districts, get_states
+from location_search import LocationIndex
+
+# Browsers reuse catalog responses for an hour, then revalidate with the ETag
+CATALOG_MAX_AGE = 3600
+
+
+def source_fingerprint():
+    """Hash the catalog source data"""
+    return hashlib.blake2b(dumps([INDIAN_LOCATIONS, TAMIL_NADU_CROP_DATA]), digest_size=16).hexdigest()
+
+
+class CatalogResponses:
+    """Precomputed responses for the location and crop catalog endpoints"""
+
+    def __init__(self, dashboard_service):
+        self.dashboard_service = dashboard_service
+        self.fingerprint = None
+        self._blobs = {}
+        self.location_index = None
+        self.refresh()
+
+    def _blob(self, payload):
+        return PrecomputedJSON(payload, max_age=CATALOG_MAX_AGE, precompress=True)
+
+    def refresh(self):
+        """Rebuild the responses if the source data changed; returns whether it did"""
+        fingerprint = source_fingerprint()
+        if fingerprint == self.fingerprint:
+            return False
+
+        blobs = {
+            ('locations',): self._blob({'locations': get_all_locations()}),
+            ('states',): self._blob({'states': get_states()}),
+            ('districts',): self._blob({'districts': []}),
+            ('cities',): self._blob({'cities': []}),
+            ('tamilnadu_crops',): self._blob({
+                'tamilnadu_crops': self.dashboard_service.get_tamilnadu_crop_distribution()
+            })
+        }
+        for state in get_states():
+            blobs[('districts', state)] = self._blob({'districts': get_districts(state)})
+            for district in get_districts(state):
+                blobs[('cities', state, district)] = self._blob({'cities': get_cities(state, district)})
+
+        # Swap in the whole set at once so requests never mix two versions
+        self._blobs = blobs
+        self.location_index = LocationIndex(INDIAN_LOCATIONS)
+        self.fingerprint = fingerprint
+        print(f"Compiled {len(blobs)} catalog responses (source {fingerprint[:12]})")
+        return True
+
+    def response(self, response_class, name, *key):
+        """Serve a catalog response; unknown states/districts get the empty list"""
+        blobs = self._blobs
+        blob = blobs.get((name,) + key) or blobs[(name,)]
+        return blob.response(response_class)
@@ -67,6 +67,11 @@ TAMIL_NADU_CROP_DATA = {
     }
 }
 
+# District-wise crop distribution by state; add a state here once its data is available
+STATE_CROP_DISTRIBUTION_DATA = {
+    'Tamil Nadu': TAMIL_NADU_CROP_DATA
+}
+
 # State-wise District Data for Top Price Analysis
 STATE_DISTRICT_DATA = {
     'Maharashtra': {
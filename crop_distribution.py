@@ -0,0 +1,132 @@
+"""
+Crop Distribution - Materialized district crop-distribution aggregates
+
+For every state in STATE_CROP_DISTRIBUTION_DATA the district records,
+dominant crops, crop areas, area-weighted state shares and totals are computed
+once, together with sort orders and crop filters. Queries only filter and
+slice those prebuilt indexes. refresh() fingerprints the source data and
+rebuilds only when it changed.
+"""
+import hashlib
+
+from api_response import dumps
+from crop_data import STATE_CROP_DISTRIBUTION_DATA
+
+NON_CROP_FIELDS = ('total_area', 'productivity')
+
+SORT_FIELDS = ('dominant_percentage', 'total_area', 'productivity_score', 'district', 'share')
+
+
+def _district_record(district, data):
+    crops = {k: v for k, v in data.items() if k not in NON_CROP_FIELDS}
+    dominant_crop = max(crops, key=crops.get)
+    return {
+        'district': district,
+        'dominant_crop': dominant_crop,
+        'dominant_percentage': crops[dominant_crop],
+        'crop_distribution': crops,
+        'total_area': data['total_area'],
+        'productivity_score': data['productivity']
+    }
+
+
+class StateDistribution:
+    """Precomputed records, totals and indexes for one state"""
+
+    def __init__(self, state, districts):
+        self.state = state
+        self.records = [_district_record(district, data) for district, data in districts.items()]
+
+        crop_areas = {}
+        total_area = 0
+        weighted_productivity = 0
+        for record in self.records:
+            total_area += record['total_area']
+            weighted_productivity += record['productivity_score'] * record['total_area']
+            for crop, percentage in record['crop_distribution'].items():
+                crop_areas[crop] = crop_areas.get(crop, 0) + record['total_area'] * percentage / 100
+
+        shares = {
+            crop: round(area / total_area * 100, 2) if total_area else 0
+            for crop, area in sorted(crop_areas.items(), key=lambda item: item[1], reverse=True)
+        }
+        self.totals = {
+            'districts': len(self.records),
+            'total_area': total_area,
+            'crop_area': {crop: round(area, 2) for crop, area in crop_areas.items()},
+            'crop_share': shares,
+            'dominant_crop': next(iter(shares), None),
+            'productivity_score': round(weighted_productivity / total_area, 2) if total_area else None
+        }
+
+        # Record positions in both directions; stable sorts keep ties in source order either way
+        positions = range(len(self.records))
+        self.orders = {
+            (field, descending): sorted(positions, key=lambda i: self.records[i][field], reverse=descending)
+            for field in SORT_FIELDS if field != 'share'
+            for descending in (False, True)
+        }
+        self.share_orders = {
+            (crop, descending): sorted(
+                (i for i in positions if crop in self.records[i]['crop_distribution']),
+                key=lambda i: self.records[i]['crop_distribution'][crop],
+                reverse=descending
+            )
+            for crop in crop_areas
+            for descending in (False, True)
+        }
+        self.by_crop = {crop: set(order) for (crop, _), order in self.share_orders.items()}
+        self.by_dominant = {}
+        for i, record in enumerate(self.records):
+            self.by_dominant.setdefault(record['dominant_crop'], set()).add(i)
+
+    def query(self, crop=None, dominant=None, sort='dominant_percentage', descending=True, limit=None):
+        """Get district records growing `crop` and/or dominated by `dominant`, sorted and limited"""
+        if sort == 'share':
+            if crop is None:
+                raise ValueError("Sorting by share needs a crop")
+            order = self.share_orders.get((crop, descending), [])
+        elif (sort, descending) in self.orders:
+            order = self.orders[(sort, descending)]
+        else:
+            raise ValueError(f"sort must be one of: {', '.join(SORT_FIELDS)}")
+        if limit is not None and limit < 0:
+            raise ValueError("limit must not be negative")
+
+        filters = []
+        if crop is not None:
+            filters.append(self.by_crop.get(crop, set()))
+        if dominant is not None:
+            filters.append(self.by_dominant.get(dominant, set()))
+
+        results = []
+        for i in order:
+            if limit is not None and len(results) >= limit:
+                break
+            if all(i in allowed for allowed in filters):
+                results.append(self.records[i])
+        return results
+
+
+class CropDistributionAggregates:
+    """Crop-distribution aggregates for every state with distribution data"""
+
+    def __init__(self, source=STATE_CROP_DISTRIBUTION_DATA):
+        self.source = source
+        self.fingerprint = None
+        self.states = {}
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the aggregates if the source data changed; returns whether it did"""
+        fingerprint = hashlib.blake2b(dumps(self.source), digest_size=16).hexdigest()
+        if fingerprint == self.fingerprint:
+            return False
+
+        self.states = {state: StateDistribution(state, districts) for state, districts in self.source.items()}
+        self.fingerprint = fingerprint
+        return True
+
+    def get(self, state):
+        """Get a state's aggregates, or None if there is no distribution data for it"""
+        return self.states.get(state)
@@ -1,45 +1,91 @@
 """
 Dashboard Data Service - Provides real-time farm monitoring data
 """
-import random
+import time
 from datetime import datetime, timedelta
-import json
-from crop_data import TAMIL_NADU_CROP_DATA, STATE_DISTRICT_DATA, CROP_BASE_PRICES
+import numpy as np
+from crop_data import STATE_DISTRICT_DATA
+from price_ranking import PriceRanking
+from crop_distribution import CropDistributionAggregates
+from simulation import Simulation
+from data_providers import region_key
+from region_snapshot import (SNAPSHOT_INTERVAL_SECONDS, RegionSnapshot, market_regions, staleness,
+                             weather_regions)
+
+MARKET_BASE_PRICES = {'wheat': 25, 'rice': 30, 'corn': 20, 'cotton': 45, 'sugarcane': 35, 'soybean': 40}
+MARKET_CROPS = list(MARKET_BASE_PRICES)
+HEALTH_CROPS = ['wheat', 'rice', 'corn', 'cotton']
+CURRENT_CONDITIONS = ['Sunny', 'Partly Cloudy', 'Cloudy', 'Light Rain']
+FORECAST_CONDITIONS = ['Sunny', 'Partly Cloudy', 'Cloudy', 'Rain', 'Thunderstorm']
 
 class DashboardService:
-    def __init__(self):
+    def __init__(self, simulation=None, providers=None):
+        # Every simulated value is a function of (seed, location, crop, time bucket)
+        self.simulation = simulation or Simulation()
+        # Optional mandi/weather feeds; regions they cover replace the simulated values
+        self.providers = providers
+        # Start from simulation only; feeds are overlaid by the first scheduled refresh,
+        # so a slow or unreachable upstream never delays startup
         self.market_data = self._generate_market_data()
         self.weather_data = self._generate_weather_data()
         self.crop_health_data = self._generate_crop_health_data()
+        self.price_ranking = PriceRanking(self.simulation)
+        self.crop_distribution = CropDistributionAggregates()
     
     def get_live_market_rates(self, state=None, district=None):
         """Get current market rates for crops"""
-        crops = ['wheat', 'rice', 'corn', 'cotton', 'sugarcane', 'soybean']
-        market_rates = []
+        return self.get_market_rates_snapshot(state, district)[0]
+    
+    def get_market_rates_snapshot(self, state=None, district=None):
+        """Get (market rates, staleness) from the current snapshot, simulating regions outside it"""
+        found = self.market_data.get((state, district))
+        if found is not None:
+            return found
         
-        for crop in crops:
-            base_price = {'wheat': 25, 'rice': 30, 'corn': 20, 'cotton': 45, 'sugarcane': 35, 'soybean': 40}[crop]
-            current_price = base_price * (0.9 + random.random() * 0.2)
-            change = (random.random() - 0.5) * 10
-            
-            market_rates.append({
-                'crop': crop,
-                'current_price': round(current_price, 2),
-                'price_change': round(change, 2),
-                'trend': 'up' if change > 0 else 'down',
-                'market': f"{district} Mandi" if district else "Local Mandi",
-                'last_updated': datetime.now().isoformat()
-            })
+        generated_at = time.time()
+        rates = self._simulate_market_rates([(state, district)], self.simulation.bucket(generated_at))
+        return rates[(state, district)], staleness(generated_at, SNAPSHOT_INTERVAL_SECONDS, 'live')
+    
+    def _simulate_market_rates(self, regions, bucket):
+        """Simulate market rates for many (state, district) regions in one vectorized pass"""
+        sim = self.simulation
+        keys = sim.extend([sim.entity(state, district) for state, district in regions], MARKET_CROPS)
+        base_prices = np.array([MARKET_BASE_PRICES[crop] for crop in MARKET_CROPS])
+        prices = np.round(base_prices * (0.9 + sim.uniform('market.price', keys, bucket) * 0.2), 2).tolist()
+        changes = np.round((sim.uniform('market.change', keys, bucket) - 0.5) * 10, 2).tolist()
+        last_updated = sim.bucket_start(bucket).isoformat()
         
-        return market_rates
+        market_data = {}
+        for region, region_prices, region_changes in zip(regions, prices, changes):
+            district = region[1]
+            market = f"{district} Mandi" if district else "Local Mandi"
+            market_data[region] = [
+                {
+                    'crop': crop,
+                    'current_price': current_price,
+                    'price_change': change,
+                    'trend': 'up' if change > 0 else 'down',
+                    'market': market,
+                    'last_updated': last_updated
+                }
+                for crop, current_price, change in zip(MARKET_CROPS, region_prices, region_changes)
+            ]
+        
+        return market_data
     
     def get_crop_health_summary(self, state=None, district=None, city=None):
         """Get crop health data using simulated satellite indices"""
-        crops = ['wheat', 'rice', 'corn', 'cotton']
+        sim = self.simulation
+        bucket = sim.bucket()
+        keys = sim.extend(sim.entity(state, district, city), HEALTH_CROPS)
+        ndvi_scores = 0.3 + sim.uniform('health.ndvi', keys, bucket) * 0.6  # NDVI typically 0.3-0.9
+        areas = sim.randint('health.area', keys, 50, 500, bucket)
+        pass_hours = sim.randint('health.pass_hours', keys, 1, 24, bucket)
+        bucket_start = sim.bucket_start(bucket)
         health_data = []
         
-        for crop in crops:
-            ndvi_score = 0.3 + random.random() * 0.6  # NDVI typically 0.3-0.9
+        for crop, ndvi_score, area, hours in zip(HEALTH_CROPS, ndvi_scores.tolist(), areas.tolist(),
+                                                 pass_hours.tolist()):
             health_score = int(ndvi_score * 100)
             
             if health_score >= 80:
@@ -61,41 +107,68 @@ class DashboardService:
                 'health_score': health_score,
                 'status': status,
                 'color': color,
-                'area_hectares': random.randint(50, 500),
-                'last_satellite_pass': (datetime.now() - timedelta(hours=random.randint(1, 24))).isoformat()
+                'area_hectares': area,
+                'last_satellite_pass': (bucket_start - timedelta(hours=hours)).isoformat()
             })
         
         return health_data
     
     def get_weather_data(self, state=None, district=None, city=None):
         """Get hyper-local weather data with forecast"""
-        current_weather = {
-            'temperature': random.randint(20, 35),
-            'humidity': random.randint(40, 80),
-            'rainfall_today': round(random.random() * 10, 1),
-            'wind_speed': random.randint(5, 25),
-            'condition': random.choice(['Sunny', 'Partly Cloudy', 'Cloudy', 'Light Rain']),
-            'last_updated': datetime.now().isoformat()
-        }
+        return self.get_weather_snapshot(state, district, city)[0]
+    
+    def get_weather_snapshot(self, state=None, district=None, city=None):
+        """Get (weather, staleness) from the current snapshot, simulating regions outside it"""
+        region = (state, district, city)
+        found = self.weather_data.get(region)
+        if found is not None:
+            return found
         
-        # 7-day forecast
-        forecast = []
-        for i in range(7):
-            date = datetime.now() + timedelta(days=i+1)
-            forecast.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'day': date.strftime('%A'),
-                'max_temp': random.randint(25, 38),
-                'min_temp': random.randint(15, 25),
-                'rainfall_chance': random.randint(0, 100),
-                'condition': random.choice(['Sunny', 'Partly Cloudy', 'Cloudy', 'Rain', 'Thunderstorm'])
-            })
+        generated_at = time.time()
+        weather = self._simulate_weather([region], self.simulation.bucket(generated_at))
+        return weather[region], staleness(generated_at, SNAPSHOT_INTERVAL_SECONDS, 'live')
+    
+    def _simulate_weather(self, regions, bucket):
+        """Simulate current weather and a 7-day forecast for many regions in one vectorized pass"""
+        sim = self.simulation
+        bucket_start = sim.bucket_start(bucket)
+        locations = np.array([sim.entity(*region) for region in regions], dtype=np.uint64)
+        temperatures = sim.randint('weather.temperature', locations, 20, 35, bucket).tolist()
+        humidities = sim.randint('weather.humidity', locations, 40, 80, bucket).tolist()
+        rainfalls = np.round(sim.uniform('weather.rainfall', locations, bucket) * 10, 1).tolist()
+        wind_speeds = sim.randint('weather.wind_speed', locations, 5, 25, bucket).tolist()
+        current_conditions = sim.choice('weather.condition', locations, CURRENT_CONDITIONS, bucket).tolist()
+        last_updated = bucket_start.isoformat()
         
-        return {
-            'current': current_weather,
-            'forecast': forecast,
-            'location': f"{city}, {district}, {state}" if all([city, district, state]) else "Local Area"
-        }
+        # 7-day forecast, one entity per region and forecast date
+        dates = [bucket_start + timedelta(days=i+1) for i in range(7)]
+        days = [{'date': date.strftime('%Y-%m-%d'), 'day': date.strftime('%A')} for date in dates]
+        keys = sim.extend(locations, [day['date'] for day in days])
+        max_temps = sim.randint('forecast.max_temp', keys, 25, 38, bucket).tolist()
+        min_temps = sim.randint('forecast.min_temp', keys, 15, 25, bucket).tolist()
+        rainfall_chances = sim.randint('forecast.rainfall_chance', keys, 0, 100, bucket).tolist()
+        conditions = sim.choice('forecast.condition', keys, FORECAST_CONDITIONS, bucket).tolist()
+        
+        weather_data = {}
+        for i, (state, district, city) in enumerate(regions):
+            weather_data[(state, district, city)] = {
+                'current': {
+                    'temperature': temperatures[i],
+                    'humidity': humidities[i],
+                    'rainfall_today': rainfalls[i],
+                    'wind_speed': wind_speeds[i],
+                    'condition': current_conditions[i],
+                    'last_updated': last_updated
+                },
+                'forecast': [
+                    dict(day, max_temp=max_temps[i][j], min_temp=min_temps[i][j],
+                         rainfall_chance=rainfall_chances[i][j], condition=conditions[i][j])
+                    for j, day in enumerate(days)
+                ],
+                'location': f"{city}, {district}, {state}" if all([city, district, state]) else "Local Area"
+            }
+        
+        return weather_data
     
     def get_market_alerts(self):
         """Get current market alerts and notifications"""
@@ -118,60 +191,70 @@ class DashboardService:
         ]
         return alerts
     
-    def _generate_market_data(self):
-        """Generate sample market data"""
-        return {}
+    def _generate_market_data(self, feed=None):
+        """Generate a market rates snapshot for every catalog region"""
+        generated_at = time.time()
+        regions = market_regions()
+        rates = self._simulate_market_rates(regions, self.simulation.bucket(generated_at))
+        return RegionSnapshot(self._apply_feed(rates, regions, feed), generated_at)
     
-    def _generate_weather_data(self):
-        """Generate sample weather data"""
-        return {}
+    def _generate_weather_data(self, feed=None):
+        """Generate a weather snapshot for every catalog region"""
+        generated_at = time.time()
+        regions = weather_regions()
+        weather = self._simulate_weather(regions, self.simulation.bucket(generated_at))
+        return RegionSnapshot(self._apply_feed(weather, regions, feed), generated_at)
+    
+    def _apply_feed(self, values, regions, feed):
+        """Replace simulated values with feed records for the regions the feed covers"""
+        if feed:
+            for region in regions:
+                record = feed.get(region_key(region))
+                if record is not None:
+                    values[region] = record
+        return values
+    
+    def refresh_snapshots(self):
+        """Rebuild the market and weather snapshots; readers keep the ones they started with"""
+        mandi = weather = None
+        if self.providers:
+            # Latest results of the providers' poller; this runs on the scheduler thread and never fetches
+            mandi, weather = self.providers.latest('mandi'), self.providers.latest('weather')
+        self.market_data = self._generate_market_data(mandi)
+        self.weather_data = self._generate_weather_data(weather)
+    
+    def get_provider_stats(self):
+        """Get circuit and cache state of the data feeds, or None without feeds"""
+        return self.providers.stats() if self.providers else None
     
     def _generate_crop_health_data(self):
         """Generate sample crop health data"""
         return {}
     
-    def get_top_districts_by_price(self, state, crop):
-        """Get top 5 districts with highest prices for a crop in a state"""
+    def get_top_districts_by_price(self, state, crop, k=5):
+        """Get top k districts with highest prices for a crop in a state"""
         if state not in STATE_DISTRICT_DATA:
             return []
         
-        districts = STATE_DISTRICT_DATA[state]['districts']
-        base_price = CROP_BASE_PRICES.get(crop, 30)
-        
-        district_prices = []
-        for district in districts:
-            price_multiplier = 0.85 + random.random() * 0.4
-            current_price = base_price * price_multiplier
-            price_change = (random.random() - 0.5) * 15
-            
-            district_prices.append({
-                'district': district,
-                'current_price': round(current_price, 2),
-                'price_change': round(price_change, 2),
-                'trend': 'up' if price_change > 0 else 'down',
-                'market_volume': random.randint(200, 1500),
-                'last_updated': datetime.now().isoformat()
-            })
-        
-        district_prices.sort(key=lambda x: x['current_price'], reverse=True)
-        return district_prices[:5]
+        return self.price_ranking.top_k([crop], k, state)[crop]
+    
+    def get_price_rankings(self, state=None, crops=None, k=5):
+        """Get top k districts by price for several crops, in a state or across India"""
+        return self.price_ranking.top_k(crops or self.price_ranking.crops, k, state)
         
     def get_tamilnadu_crop_distribution(self):
         """Get Tamil Nadu district-wise crop distribution data"""
-        district_data = []
-        
-        for district, data in TAMIL_NADU_CROP_DATA.items():
-            crops = {k: v for k, v in data.items() if k not in ['total_area', 'productivity']}
-            dominant_crop = max(crops, key=crops.get)
-            dominant_percentage = crops[dominant_crop]
-            
-            district_data.append({
-                'district': district,
-                'dominant_crop': dominant_crop,
-                'dominant_percentage': dominant_percentage,
-                'crop_distribution': crops,
-                'total_area': data['total_area'],
-                'productivity_score': data['productivity']
-            })
+        return self.crop_distribution.get('Tamil Nadu').query()
+    
+    def get_crop_distribution(self, state, crop=None, dominant=None, sort='dominant_percentage',
+                              descending=True, limit=None):
+        """Get district crop distribution and state totals, or None if the state has no data"""
+        aggregates = self.crop_distribution.get(state)
+        if aggregates is None:
+            return None
         
-        return sorted(district_data, key=lambda x: x['dominant_percentage'], reverse=True)
\ No newline at end of file
+        return {
+            'state': state,
+            'totals': aggregates.totals,
+            'districts': aggregates.query(crop, dominant, sort, descending, limit)
+        }
@@ -0,0 +1,77 @@
+"""
+Dashboard Summary - Every dashboard section for a location in one response
+
+The sections behind /market-rates, /crop-health, /weather, /alerts and
+/top-districts are gathered concurrently on a shared thread pool. Each
+section has its own deadline, measured from the start of the request; a
+section that misses it (or fails) is left out and named in `errors`, and the
+rest of the summary is returned with `partial: true`.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+# Seconds each section may take, counted from the start of the summary
+SECTION_DEADLINES = {
+    'market_rates': 0.5,
+    'crop_health': 1.0,
+    'weather': 0.5,
+    'alerts': 0.5,
+    'top_districts': 1.0
+}
+
+MAX_WORKERS = 16
+
+
+class DashboardSummary:
+    """Concurrent fan-out over DashboardService sections"""
+
+    def __init__(self, dashboard_service, deadlines=None, max_workers=MAX_WORKERS):
+        self.dashboard_service = dashboard_service
+        self.deadlines = dict(SECTION_DEADLINES, **(deadlines or {}))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='summary')
+
+    def _sections(self, state, district, city, crop, k):
+        """Section name -> callable returning (data, snapshot metadata or None)"""
+        service = self.dashboard_service
+        sections = {
+            'market_rates': lambda: service.get_market_rates_snapshot(state, district),
+            'crop_health': lambda: (service.get_crop_health_summary(state, district, city), None),
+            'weather': lambda: service.get_weather_snapshot(state, district, city),
+            'alerts': lambda: (service.get_market_alerts(), None)
+        }
+        # Top districts need both a state and a crop, as on /top-districts
+        if state and crop:
+            sections['top_districts'] = lambda: (service.get_top_districts_by_price(state, crop, k), None)
+        return sections
+
+    def get(self, state=None, district=None, city=None, crop=None, k=5):
+        """Gather all sections, returning whatever finished within its deadline"""
+        started = time.monotonic()
+        futures = {name: self._executor.submit(section)
+                   for name, section in self._sections(state, district, city, crop, k).items()}
+
+        summary = {'location': {'state': state, 'district': district, 'city': city, 'crop': crop}}
+        snapshots = {}
+        errors = {}
+        for name, future in futures.items():
+            remaining = started + self.deadlines[name] - time.monotonic()
+            try:
+                data, snapshot = future.result(timeout=max(0.0, remaining))
+            except TimeoutError:
+                # Not started yet means the pool is saturated; don't run it late
+                future.cancel()
+                errors[name] = f"Timed out after {self.deadlines[name]}s"
+                continue
+            except Exception as e:
+                errors[name] = str(e)
+                continue
+
+            summary[name] = data
+            if snapshot is not None:
+                snapshots[name] = snapshot
+
+        summary['snapshot'] = snapshots
+        summary['partial'] = bool(errors)
+        summary['errors'] = errors
+        summary['duration_ms'] = round((time.monotonic() - started) * 1000, 2)
+        return summary
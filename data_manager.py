@@ -1,14 +1,24 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import json
 import os
+import threading
+import time
+from historical_store import (HistoricalStore, convert_json_to_columnar, rows_to_columns, columns_to_rows,
+                              parse_period, period_of)
+from ingest_log import IngestLog, replay, segment_token
 
 class DataManager:
     def __init__(self):
         self.data_dir = "data"
         self.ensure_data_directory()
-        self.historical_data = {}
+        self.store = HistoricalStore(os.path.join(self.data_dir, "historical"))
+        self.ingest_log = IngestLog(os.path.join(self.data_dir, "ingest.log"))
+        self.compaction_threshold = 10000
+        self.compaction_lock_timeout = 600
+        self.records_since_compaction = 0
+        self._ingest_lock = threading.Lock()
+        self._compaction_thread = None
         self.load_historical_data()
     
     def ensure_data_directory(self):
@@ -17,18 +27,53 @@ class DataManager:
             os.makedirs(self.data_dir)
     
     def load_historical_data(self):
-        """Load historical data from files or create sample data"""
+        """Load historical data from the columnar store or create sample data"""
         historical_file = os.path.join(self.data_dir, "historical_data.json")
         
-        if os.path.exists(historical_file):
-            with open(historical_file, 'r') as f:
-                self.historical_data = json.load(f)
-        else:
-            self.create_sample_historical_data()
-            self.save_historical_data()
+        if not self.store.exists():
+            if os.path.exists(historical_file):
+                # One-shot import of the legacy JSON file
+                convert_json_to_columnar(historical_file, self.store.directory)
+            else:
+                self.save_historical_data(self.create_sample_historical_data())
+        
+        self.store.load()
+        self.replay_ingest_log()
+    
+    def replay_ingest_log(self):
+        """Rebuild data points ingested since the last compaction from the log"""
+        applied_logs = set(self.store.metadata.get('applied_logs', []))
+        replayed = 0
+        
+        for segment in self.ingest_log.segments():
+            if segment_token(segment) in applied_logs:
+                # Left behind by a compaction that stopped before cleanup
+                self._remove_file(segment)
+            else:
+                replayed += self._replay_into(self.store, segment)
+        
+        replayed += self._replay_into(self.store, self.ingest_log.path)
+        self.records_since_compaction = replayed
+    
+    def _replay_into(self, store, log_path):
+        """Append every record of a log file to a store"""
+        replayed = 0
+        for record in replay(log_path):
+            key = record.pop('key')
+            store.append(key, [record])
+            replayed += 1
+        return replayed
+    
+    def _remove_file(self, path):
+        """Remove a file if it still exists"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
     
     def create_sample_historical_data(self):
         """Create sample historical data for different crops and districts"""
+        historical_data = {}
         crops = ['wheat', 'rice', 'corn', 'cotton', 'sugarcane', 'potato', 'tomato', 'onion', 'garlic', 'soybean']
         districts = ['Mumbai', 'Delhi', 'Bangalore', 'Chennai', 'Kolkata', 'Hyderabad', 'Pune', 'Ahmedabad']
         
@@ -44,7 +89,9 @@ class DataManager:
                     monthly_data = self.generate_monthly_data(crop, district, year)
                     yearly_data.extend(monthly_data)
                 
-                self.historical_data[key] = yearly_data
+                historical_data[key] = yearly_data
+        
+        return historical_data
     
     def generate_monthly_data(self, crop, district, year):
         """Generate realistic monthly data for a crop in a district"""
@@ -90,25 +137,20 @@ class DataManager:
         
         return monthly_data
     
-    def save_historical_data(self):
-        """Save historical data to file"""
-        historical_file = os.path.join(self.data_dir, "historical_data.json")
-        with open(historical_file, 'w') as f:
-            json.dump(self.historical_data, f, indent=2)
+    def save_historical_data(self, historical_data):
+        """Save {key: list of data points} to the columnar store"""
+        self.store.write({key: rows_to_columns(rows) for key, rows in historical_data.items()})
     
-    def get_historical_data(self, district, crop, years=3):
-        """Get historical data for a specific crop and district"""
-        key = f"{district}_{crop}"
-        
-        if key in self.historical_data:
-            current_year = datetime.now().year
-            filtered_data = [
-                data for data in self.historical_data[key]
-                if data['year'] >= (current_year - years)
-            ]
-            return filtered_data
-        
-        return []
+    def _resolve_range(self, years, start, end):
+        """Turn a `years` window or explicit start/end periods into month numbers"""
+        if start is None and end is None and years is not None:
+            return period_of(datetime.now().year - years, 1), None
+        return parse_period(start), parse_period(end)
+    
+    def get_historical_data(self, district, crop, years=3, start=None, end=None):
+        """Get historical data for a crop and district, for the last `years` years or start/end ('YYYY-MM')"""
+        start, end = self._resolve_range(years, start, end)
+        return columns_to_rows(self.store.query(f"{district}_{crop}", start, end))
     
     def add_real_time_data(self, district, crop, demand, price):
         """Add real-time data point"""
@@ -124,16 +166,97 @@ class DataManager:
             'is_real_time': True
         }
         
-        if key not in self.historical_data:
-            self.historical_data[key] = []
+        self.append_records([dict(data_point, key=key)])
+    
+    def append_records(self, records, sync=False):
+        """Log data points and add them to the in-memory series, grouped by series"""
+        series = {}
+        for record in records:
+            data_point = dict(record)
+            series.setdefault(data_point.pop('key'), []).append(data_point)
+        
+        with self._ingest_lock:
+            # The whole batch goes to the log as a single append
+            self.ingest_log.append(records, sync=sync)
+            for key, data_points in series.items():
+                self.store.append(key, data_points)
+            self.records_since_compaction += len(records)
         
-        self.historical_data[key].append(data_point)
-        self.save_historical_data()
+        if self.records_since_compaction >= self.compaction_threshold:
+            self.start_compaction()
+        
+        return len(series)
+    
+    def start_compaction(self):
+        """Compact the ingest log in a background thread"""
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        
+        self._compaction_thread = threading.Thread(target=self.compact_historical_data, daemon=True)
+        self._compaction_thread.start()
+    
+    def compact_historical_data(self):
+        """Fold logged data points into a new columnar snapshot"""
+        lock_path = os.path.join(self.data_dir, "compaction.lock")
+        if (os.path.exists(lock_path) and
+                time.time() - os.path.getmtime(lock_path) > self.compaction_lock_timeout):
+            # The process holding the lock died mid-compaction
+            self._remove_file(lock_path)
+        
+        try:
+            lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        
+        try:
+            self.ingest_log.rotate()
+            
+            # Start from the latest snapshot on disk, which other workers may have written
+            compacted = HistoricalStore(self.store.directory)
+            compacted.load()
+            applied_logs = set(compacted.metadata.get('applied_logs', []))
+            
+            segments = []
+            for segment in self.ingest_log.segments():
+                if segment_token(segment) in applied_logs:
+                    self._remove_file(segment)
+                else:
+                    self._replay_into(compacted, segment)
+                    segments.append(segment)
+            
+            compacted.write(compacted.snapshot(), metadata={
+                'applied_logs': [segment_token(segment) for segment in segments]
+            })
+            for segment in segments:
+                self._remove_file(segment)
+            
+            self.reload_historical_data()
+            
+            return True
+        finally:
+            os.close(lock_fd)
+            self._remove_file(lock_path)
+    
+    def reload_historical_data(self):
+        """Reload the current snapshot and replay the shared log, picking up other workers' data points"""
+        with self._ingest_lock:
+            self.ingest_log.flush()
+            self.store.load()
+            self.replay_ingest_log()
+    
+    def get_training_data(self):
+        """Get a consistent copy of every series for model training"""
+        with self._ingest_lock:
+            return self.store.snapshot()
+    
+    def get_data_fingerprint(self):
+        """Get a cheap marker that changes whenever data points are added"""
+        return f"rows:{len(self.store.columns['year']) + self.records_since_compaction}"
     
     def get_crop_list(self):
         """Get list of available crops"""
         crops = set()
-        for key in self.historical_data.keys():
+        for key in self.store.keys():
             district, crop = key.split('_', 1)
             crops.add(crop)
         return sorted(list(crops))
@@ -141,33 +264,21 @@ class DataManager:
     def get_district_list(self):
         """Get list of available districts"""
         districts = set()
-        for key in self.historical_data.keys():
+        for key in self.store.keys():
             district, crop = key.split('_', 1)
             districts.add(district)
         return sorted(list(districts))
     
-    def get_statistics(self, district, crop):
+    def get_statistics(self, district, crop, years=3, start=None, end=None):
         """Get statistical information for a crop in a district"""
-        historical_data = self.get_historical_data(district, crop)
+        start, end = self._resolve_range(years, start, end)
+        stats = self.store.get_statistics(f"{district}_{crop}", start, end)
         
-        if not historical_data:
+        if stats is None:
             return None
         
-        demands = [d['demand'] for d in historical_data]
-        prices = [d['price'] for d in historical_data]
-        
         return {
-            'demand_stats': {
-                'mean': np.mean(demands),
-                'std': np.std(demands),
-                'min': np.min(demands),
-                'max': np.max(demands)
-            },
-            'price_stats': {
-                'mean': np.mean(prices),
-                'std': np.std(prices),
-                'min': np.min(prices),
-                'max': np.max(prices)
-            },
-            'data_points': len(historical_data)
-        }
\ No newline at end of file
+            'demand_stats': stats['demand'],
+            'price_stats': stats['price'],
+            'data_points': stats['data_points']
+        }
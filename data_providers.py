@@ -0,0 +1,297 @@
+"""
+Data Providers - News, weather and mandi feeds behind one fetch interface
+
+Every provider call goes through the same guard rails: a per-provider
+timeout, a few retries with full-jitter backoff, a circuit breaker that stops
+calling an upstream after repeated failures, and a TTL cache that keeps the
+last good response to serve while the upstream is down. DataProviders fetches
+several feeds concurrently on a small thread pool under an overall deadline.
+
+A poller thread started by DataProviders.start() fetches every feed on an
+interval. The news check and the dashboard snapshot refresh only read its
+latest results, so neither request threads nor the scheduler thread (which
+also renews the leader lease) ever wait on an upstream.
+
+Backends, chosen by DATA_PROVIDER:
+- none (default): no feeds; news and dashboard data stay simulated
+- fixture: JSON files in data/fixtures/ (news.json, weather.json, mandi.json)
+- http: NEWS_API_URL, WEATHER_API_URL and MANDI_API_URL, sharing one pooled session
+
+Weather and mandi feeds map region keys ("state|district|city" and
+"state|district", empty for a missing level) to the same records the
+dashboard endpoints return.
+"""
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ttl_cache import TTLCache
+
+KINDS = ('news', 'weather', 'mandi')
+
+KEY_SEPARATOR = '|'
+
+# (connect, read) seconds for one upstream call
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_RETRIES = 2
+BACKOFF_SECONDS = 0.2
+CACHE_TTL_SECONDS = 300
+
+# Consecutive failures that open a breaker, and how long it stays open
+FAILURE_THRESHOLD = 5
+RESET_SECONDS = 60
+
+# Overall budget for a concurrent fetch of several feeds
+FETCH_DEADLINE_SECONDS = 15
+
+POOL_SIZE = 10
+
+# How often the poller fetches every feed; cached responses stand in within the TTL
+POLL_SECONDS = 60
+
+
+class ProviderError(Exception):
+    """A feed could not be fetched and no cached response was available"""
+    pass
+
+
+class CircuitOpenError(ProviderError):
+    """The provider's circuit breaker is open; the upstream was not called"""
+    pass
+
+
+def region_key(region):
+    """Feed key for a (state, district[, city]) region tuple"""
+    return KEY_SEPARATOR.join(name or '' for name in region)
+
+
+def create_session(pool_size=POOL_SIZE):
+    """A keep-alive session whose connection pool is shared by every HTTP provider"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures, half-opens after `reset_seconds`"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Whether a call may go upstream; a half-open breaker lets calls probe"""
+        return self.state != 'open'
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # A failed probe re-opens a half-open breaker for another full period
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class DataProvider(ABC):
+    """Base provider; subclasses implement _fetch(params)"""
+
+    def __init__(self, name, kind, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 cache_ttl=CACHE_TTL_SECONDS, breaker=None):
+        self.name = name
+        self.kind = kind
+        self.timeout = timeout
+        self.retries = retries
+        self.breaker = breaker or CircuitBreaker()
+        self.cache = TTLCache(max_entries=256, ttl_seconds=cache_ttl)
+        self.last_error = None
+        self.last_success = None
+        self._last_good = {}
+
+    @abstractmethod
+    def _fetch(self, params):
+        """Fetch the feed from the upstream once, raising on any failure"""
+
+    def fetch(self, params=None):
+        """Get the feed, from cache while fresh, falling back to the last good response on failure"""
+        cache_key = json.dumps(params, sort_keys=True)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            data = self._fetch_with_retries(params)
+        except ProviderError as e:
+            self.last_error = str(e)
+            if cache_key in self._last_good:
+                print(f"Provider {self.name} failed, serving last good response: {e}")
+                return self._last_good[cache_key]
+            raise
+
+        self.cache.put(cache_key, data)
+        self._last_good[cache_key] = data
+        self.last_success = time.time()
+        return data
+
+    def _fetch_with_retries(self, params):
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Circuit open for provider {self.name}")
+
+            try:
+                data = self._fetch(params)
+            except (requests.RequestException, ValueError, OSError) as e:
+                self.breaker.record_failure()
+                if attempt == self.retries:
+                    raise ProviderError(f"Provider {self.name} failed after {attempt + 1} attempts: {e}")
+                # Full jitter keeps workers that failed together from retrying together
+                time.sleep(random.uniform(0, BACKOFF_SECONDS * 2 ** attempt))
+            else:
+                self.breaker.record_success()
+                return data
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'circuit': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'last_success': self.last_success,
+            'last_error': self.last_error,
+            'cache': self.cache.stats()
+        }
+
+
+class HTTPProvider(DataProvider):
+    """JSON feed fetched with GET from an upstream URL"""
+
+    def __init__(self, name, kind, url, session, **kwargs):
+        super().__init__(name, kind, **kwargs)
+        self.url = url
+        self.session = session
+
+    def _fetch(self, params):
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class FixtureProvider(DataProvider):
+    """Stand-in provider serving a JSON file, for offline development and tests
+
+    `latency` adds a delay per call to mimic a slow upstream.
+    """
+
+    def __init__(self, name, kind, path, latency=0, **kwargs):
+        super().__init__(name, kind, **kwargs)
+        self.path = path
+        self.latency = latency
+
+    def _fetch(self, params):
+        if self.latency:
+            time.sleep(self.latency)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+class DataProviders:
+    """Providers by kind, fetched concurrently under a deadline"""
+
+    def __init__(self, providers, max_workers=4, poll_seconds=POLL_SECONDS):
+        self.providers = {provider.kind: provider for provider in providers}
+        self.poll_seconds = poll_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='provider')
+        self._latest = {}
+        self._poller = None
+
+    def get(self, kind):
+        return self.providers.get(kind)
+
+    def start(self):
+        """Fetch every feed on a background thread from now on"""
+        if self._poller is None:
+            self._poller = threading.Thread(target=self._poll, daemon=True, name='provider-poller')
+            self._poller.start()
+
+    def _poll(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Provider poll failed: {e}")
+            time.sleep(self.poll_seconds)
+
+    def refresh(self, deadline=FETCH_DEADLINE_SECONDS):
+        """Fetch every feed once, keeping the previous result of any feed that failed"""
+        for kind, data in self.fetch_all(deadline=deadline).items():
+            if data is not None:
+                self._latest[kind] = data
+
+    def latest(self, kind):
+        """Last successfully fetched data of a feed, or None before its first success"""
+        return self._latest.get(kind)
+
+    def fetch_all(self, kinds=None, deadline=FETCH_DEADLINE_SECONDS):
+        """Fetch several feeds at once; {kind: data}, with None for failed or late feeds"""
+        kinds = [kind for kind in (kinds or KINDS) if kind in self.providers]
+        futures = {kind: self._executor.submit(self.providers[kind].fetch) for kind in kinds}
+        wait(futures.values(), timeout=deadline)
+
+        results = {}
+        for kind, future in futures.items():
+            if not future.done():
+                print(f"Provider {self.providers[kind].name} missed the {deadline}s deadline")
+                results[kind] = None
+            elif future.exception() is not None:
+                print(f"Provider {self.providers[kind].name} unavailable: {future.exception()}")
+                results[kind] = None
+            else:
+                results[kind] = future.result()
+        return results
+
+    def stats(self):
+        return {kind: provider.stats() for kind, provider in self.providers.items()}
+
+
+def create_providers(data_dir="data"):
+    """Create the feeds named by DATA_PROVIDER ('none', 'fixture' or 'http'); None for 'none'"""
+    backend = os.environ.get('DATA_PROVIDER', 'none').lower()
+    if backend == 'none':
+        return None
+    if backend == 'fixture':
+        fixture_dir = os.environ.get('FIXTURE_DIR', os.path.join(data_dir, 'fixtures'))
+        return DataProviders([
+            FixtureProvider(f"fixture-{kind}", kind, os.path.join(fixture_dir, f"{kind}.json"))
+            for kind in KINDS
+        ])
+    if backend == 'http':
+        session = create_session()
+        urls = {kind: os.environ.get(f"{kind.upper()}_API_URL") for kind in KINDS}
+        return DataProviders([
+            HTTPProvider(f"http-{kind}", kind, url, session)
+            for kind, url in urls.items() if url
+        ])
+    raise ValueError(f"Unknown DATA_PROVIDER '{backend}', use 'none', 'fixture' or 'http'")
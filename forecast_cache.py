@@ -0,0 +1,9 @@
+"""
+Forecast Cache - Bounded LRU/TTL cache for base model forecasts
+"""
+from ttl_cache import TTLCache
+
+
+class ForecastCache(TTLCache):
+    """Base forecasts keyed by (location, crop, model version, current month)"""
+    pass
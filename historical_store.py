@@ -0,0 +1,353 @@
+"""
+Historical Store - Columnar, memory-mapped storage for monthly series
+
+Each column (year, month, demand, price, timestamp, is_real_time) is kept in
+its own .npy file and every series occupies a contiguous, time-sorted slice of
+those columns. A small JSON index maps series keys to their slice. Points
+appended since the last snapshot live in an in-memory tail per series.
+"""
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+
+COLUMNS = {
+    'year': np.int16,
+    'month': np.int8,
+    'demand': np.float64,
+    'price': np.float64,
+    'timestamp': 'datetime64[us]',
+    'is_real_time': np.bool_
+}
+
+INDEX_FILE = 'index.json'
+CURRENT_FILE = 'CURRENT'
+
+METRICS = ('demand', 'price')
+
+
+def _empty_columns():
+    """Create an empty set of columns"""
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+
+def rows_to_columns(rows):
+    """Convert a list of row dicts into time-sorted column arrays"""
+    columns = {
+        'year': np.array([row['year'] for row in rows], dtype=COLUMNS['year']),
+        'month': np.array([row['month'] for row in rows], dtype=COLUMNS['month']),
+        'demand': np.array([row['demand'] for row in rows], dtype=COLUMNS['demand']),
+        'price': np.array([row['price'] for row in rows], dtype=COLUMNS['price']),
+        'timestamp': np.array(
+            [row.get('timestamp') or datetime(row['year'], row['month'], 15).isoformat() for row in rows],
+            dtype=COLUMNS['timestamp']
+        ),
+        'is_real_time': np.array([row.get('is_real_time', False) for row in rows], dtype=COLUMNS['is_real_time'])
+    }
+
+    order = np.lexsort((columns['timestamp'], columns['month'], columns['year']))
+    return {name: values[order] for name, values in columns.items()}
+
+
+def period_of(year, month):
+    """Convert a year and month into a sortable month number"""
+    return year * 12 + (month - 1)
+
+
+def parse_period(value):
+    """Parse 'YYYY-MM', 'YYYY-MM-DD', a date or a (year, month) pair into a month number"""
+    if value is None:
+        return None
+    if isinstance(value, (tuple, list)):
+        year, month = value
+    elif hasattr(value, 'year') and hasattr(value, 'month'):
+        year, month = value.year, value.month
+    else:
+        parts = str(value).strip().split('-')
+        if len(parts) < 2:
+            raise ValueError(f"Invalid period '{value}', expected YYYY-MM")
+        year, month = int(parts[0]), int(parts[1])
+
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month in period '{value}'")
+    return period_of(int(year), int(month))
+
+
+def _summarize(values):
+    """Build a running summary [count, sum, sum of squares, min, max]"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return [0, 0.0, 0.0, np.inf, -np.inf]
+    return [len(values), float(values.sum()), float(np.dot(values, values)),
+            float(values.min()), float(values.max())]
+
+
+def _summary_stats(count, total, total_sq, minimum, maximum):
+    """Turn running sums into mean/std/min/max"""
+    mean = total / count
+    variance = max(total_sq / count - mean * mean, 0.0)
+    return {
+        'mean': mean,
+        'std': float(np.sqrt(variance)),
+        'min': minimum,
+        'max': maximum
+    }
+
+
+def columns_to_rows(columns):
+    """Convert column arrays back into the row dict format used by the API"""
+    rows = []
+    for year, month, demand, price, timestamp, is_real_time in zip(
+        columns['year'].tolist(),
+        columns['month'].tolist(),
+        columns['demand'].tolist(),
+        columns['price'].tolist(),
+        columns['timestamp'].tolist(),
+        columns['is_real_time'].tolist()
+    ):
+        row = {
+            'year': year,
+            'month': month,
+            'demand': demand,
+            'price': price,
+            'timestamp': timestamp.isoformat()
+        }
+        if is_real_time:
+            row['is_real_time'] = True
+        rows.append(row)
+
+    return rows
+
+
+class HistoricalStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.columns = _empty_columns()
+        self.series_index = {}
+        self.metadata = {}
+        self.version = None
+        self.tail = {}
+        self._merged = {}
+        self._time_indexes = {}
+        self._summaries = {}
+
+    def exists(self):
+        """Check whether a columnar snapshot has been written"""
+        return os.path.exists(os.path.join(self.directory, CURRENT_FILE))
+
+    def load(self):
+        """Memory-map the current snapshot"""
+        with open(os.path.join(self.directory, CURRENT_FILE), 'r') as f:
+            version = f.read().strip()
+
+        version_dir = os.path.join(self.directory, version)
+        with open(os.path.join(version_dir, INDEX_FILE), 'r') as f:
+            index = json.load(f)
+
+        columns = {}
+        for name in COLUMNS:
+            path = os.path.join(version_dir, f"{name}.npy")
+            # Empty files cannot be memory-mapped
+            columns[name] = np.load(path, mmap_mode='r' if index['rows'] else None)
+
+        self.columns = columns
+        self.series_index = {key: tuple(bounds) for key, bounds in index['series'].items()}
+        self.metadata = index.get('metadata', {})
+        self.version = version
+        self.tail = {}
+        self._merged = {}
+        self._time_indexes = {}
+        self._summaries = {}
+
+    def keys(self):
+        """Get all series keys"""
+        return self.series_index.keys() | self.tail.keys()
+
+    def __contains__(self, key):
+        return key in self.series_index or key in self.tail
+
+    def __len__(self):
+        return len(self.keys())
+
+    def append(self, key, rows):
+        """Append data points to a series without rewriting the snapshot"""
+        self.tail.setdefault(key, []).extend(rows)
+        self._merged.pop(key, None)
+        self._time_indexes.pop(key, None)
+
+        # Keep whole-series summaries current without rescanning the series
+        summary = self._summaries.get(key)
+        if summary is not None:
+            for metric in METRICS:
+                count, total, total_sq, minimum, maximum = summary[metric]
+                for row in rows:
+                    value = float(row[metric])
+                    count += 1
+                    total += value
+                    total_sq += value * value
+                    minimum = min(minimum, value)
+                    maximum = max(maximum, value)
+                summary[metric] = [count, total, total_sq, minimum, maximum]
+
+    def get_series(self, key):
+        """Get the columns of one series (empty columns if unknown)"""
+        bounds = self.series_index.get(key)
+        if bounds is None:
+            base = _empty_columns()
+        else:
+            start, stop = bounds
+            base = {name: values[start:stop] for name, values in self.columns.items()}
+
+        if key not in self.tail:
+            return base
+
+        merged = self._merged.get(key)
+        if merged is None:
+            tail = rows_to_columns(self.tail[key])
+            combined = {name: np.concatenate([base[name], tail[name]]) for name in COLUMNS}
+            order = np.lexsort((combined['timestamp'], combined['month'], combined['year']))
+            merged = {name: values[order] for name, values in combined.items()}
+            self._merged[key] = merged
+
+        return merged
+
+    def get_time_index(self, key):
+        """Get the sorted month numbers and prefix sums of a series"""
+        index = self._time_indexes.get(key)
+        if index is None:
+            series = self.get_series(key)
+            index = {'period': period_of(series['year'].astype(np.int32), series['month'])}
+            for metric in METRICS:
+                values = np.asarray(series[metric], dtype=np.float64)
+                index[f"{metric}_sum"] = np.concatenate([[0.0], np.cumsum(values)])
+                index[f"{metric}_sum_sq"] = np.concatenate([[0.0], np.cumsum(values * values)])
+            self._time_indexes[key] = index
+
+        return index
+
+    def _range_bounds(self, key, start=None, end=None):
+        """Binary-search the row range covering the inclusive [start, end] months"""
+        periods = self.get_time_index(key)['period']
+        low = 0 if start is None else int(np.searchsorted(periods, start, side='left'))
+        high = len(periods) if end is None else int(np.searchsorted(periods, end, side='right'))
+        return low, max(low, high)
+
+    def query(self, key, start=None, end=None):
+        """Get the columns of a series between two month numbers (inclusive)"""
+        low, high = self._range_bounds(key, start, end)
+        return {name: values[low:high] for name, values in self.get_series(key).items()}
+
+    def get_statistics(self, key, start=None, end=None):
+        """Get mean/std/min/max per metric for a series range, or None if empty"""
+        if key not in self:
+            return None
+
+        if start is None and end is None:
+            low, high = 0, None
+        else:
+            low, high = self._range_bounds(key, start, end)
+            if low == high:
+                return None
+            if low == 0 and high == len(self.get_time_index(key)['period']):
+                high = None
+
+        if high is None:
+            # The whole series is covered by the running summary
+            summary = self._summaries.get(key)
+            if summary is None:
+                series = self.get_series(key)
+                summary = {metric: _summarize(series[metric]) for metric in METRICS}
+                self._summaries[key] = summary
+            count = summary[METRICS[0]][0]
+            if not count:
+                return None
+            stats = {metric: _summary_stats(*summary[metric]) for metric in METRICS}
+        else:
+            count = high - low
+            index = self.get_time_index(key)
+            series = self.get_series(key)
+            stats = {}
+            for metric in METRICS:
+                total = index[f"{metric}_sum"][high] - index[f"{metric}_sum"][low]
+                total_sq = index[f"{metric}_sum_sq"][high] - index[f"{metric}_sum_sq"][low]
+                values = series[metric][low:high]
+                stats[metric] = _summary_stats(count, float(total), float(total_sq),
+                                               float(values.min()), float(values.max()))
+
+        stats['data_points'] = count
+        return stats
+
+    def get_rows(self, key):
+        """Get one series as a list of row dicts"""
+        return columns_to_rows(self.get_series(key))
+
+    def write(self, series, metadata=None):
+        """Write a new snapshot from {key: columns} and switch to it atomically"""
+        keys = sorted(series)
+        series_index = {}
+        parts = {name: [] for name in COLUMNS}
+        offset = 0
+
+        for key in keys:
+            columns = series[key]
+            length = len(columns['year'])
+            series_index[key] = [offset, offset + length]
+            offset += length
+            for name in COLUMNS:
+                parts[name].append(np.asarray(columns[name], dtype=COLUMNS[name]))
+
+        os.makedirs(self.directory, exist_ok=True)
+        version = f"v{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{os.getpid()}"
+        version_dir = os.path.join(self.directory, version)
+        os.makedirs(version_dir)
+
+        for name, dtype in COLUMNS.items():
+            values = np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=dtype)
+            np.save(os.path.join(version_dir, f"{name}.npy"), values)
+
+        with open(os.path.join(version_dir, INDEX_FILE), 'w') as f:
+            json.dump({'rows': offset, 'series': series_index, 'metadata': metadata or {}}, f)
+
+        # Switch readers to the new snapshot with a single atomic rename
+        current_tmp = os.path.join(self.directory, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+        with open(current_tmp, 'w') as f:
+            f.write(version)
+        os.replace(current_tmp, os.path.join(self.directory, CURRENT_FILE))
+
+        self.load()
+        self._remove_old_versions()
+
+    def snapshot(self):
+        """Get all series as {key: columns} copies, for rewriting the store"""
+        return {key: {name: np.array(values) for name, values in self.get_series(key).items()}
+                for key in self.keys()}
+
+    def _remove_old_versions(self):
+        """Delete snapshots older than the current one"""
+        for entry in os.listdir(self.directory):
+            path = os.path.join(self.directory, entry)
+            if entry.startswith('v') and entry < self.version and os.path.isdir(path):
+                # Other processes may still have the old files mapped
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def convert_json_to_columnar(json_path, directory):
+    """One-shot import of a legacy historical_data.json file"""
+    with open(json_path, 'r') as f:
+        historical_data = json.load(f)
+
+    store = HistoricalStore(directory)
+    store.write({key: rows_to_columns(rows) for key, rows in historical_data.items()})
+    return store
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python historical_store.py <historical_data.json> <output_directory>")
+        sys.exit(1)
+
+    converted = convert_json_to_columnar(sys.argv[1], sys.argv[2])
+    print(f"Converted {len(converted)} series into {sys.argv[2]}")
@@ -0,0 +1,96 @@
+"""
+ID Registry - Interns state, district, city and crop names as small integers
+
+Each kind of name gets its own dense ID space, seeded in a fixed order from
+location_data.py and crop_data.py so every process assigns the same IDs to
+catalog names. Names outside the catalog (e.g. crops that only appear in
+ingested data) are interned on first use; their IDs are process-local, so
+anything persisted across processes stores names rather than IDs.
+
+A prediction series is keyed by the tuple (state_id, district_id, city_id,
+crop_id), which hashes and compares without building or splitting strings.
+"""
+import threading
+
+from crop_data import CROP_BASE_PRICES, STATE_DISTRICT_DATA, TAMIL_NADU_CROP_DATA
+from location_data import INDIAN_LOCATIONS
+
+KINDS = ('state', 'district', 'city', 'crop')
+
+
+class IdRegistry:
+    """Bidirectional name <-> ID tables, one per kind"""
+
+    def __init__(self):
+        self._ids = {kind: {} for kind in KINDS}
+        self._names = {kind: [] for kind in KINDS}
+        self._lock = threading.Lock()
+
+    def intern(self, kind, name):
+        """Get the ID of a name, assigning the next free ID if it is new"""
+        ids = self._ids[kind]
+        name_id = ids.get(name)
+        if name_id is None:
+            with self._lock:
+                name_id = ids.get(name)
+                if name_id is None:
+                    names = self._names[kind]
+                    name_id = len(names)
+                    names.append(name)
+                    ids[name] = name_id
+        return name_id
+
+    def lookup(self, kind, name):
+        """Get the ID of a name, or None if it was never interned"""
+        return self._ids[kind].get(name)
+
+    def name(self, kind, name_id):
+        return self._names[kind][name_id]
+
+    def count(self, kind):
+        return len(self._names[kind])
+
+    def series_key(self, state, district, city, crop):
+        """Intern a prediction series' names into its ID tuple"""
+        return (self.intern('state', state), self.intern('district', district),
+                self.intern('city', city), self.intern('crop', crop))
+
+    def find_series_key(self, state, district, city, crop):
+        """Get a series' ID tuple without interning, or None if any name is unknown"""
+        key = (self.lookup('state', state), self.lookup('district', district),
+               self.lookup('city', city), self.lookup('crop', crop))
+        return None if None in key else key
+
+    def series_names(self, key):
+        """Get (state, district, city, crop) names for a series ID tuple"""
+        return tuple(self._names[kind][name_id] for kind, name_id in zip(KINDS, key))
+
+
+def build_registry():
+    """Create a registry seeded with every catalog name in a deterministic order"""
+    registry = IdRegistry()
+    for state, districts in INDIAN_LOCATIONS.items():
+        registry.intern('state', state)
+        for district, cities in districts.items():
+            registry.intern('district', district)
+            for city in cities:
+                registry.intern('city', city)
+
+    for state, data in STATE_DISTRICT_DATA.items():
+        registry.intern('state', state)
+        for district in data['districts']:
+            registry.intern('district', district)
+        for crop in data['major_crops']:
+            registry.intern('crop', crop)
+
+    for crop in CROP_BASE_PRICES:
+        registry.intern('crop', crop)
+    for district, data in TAMIL_NADU_CROP_DATA.items():
+        registry.intern('district', district)
+        for crop in data:
+            if crop not in ('total_area', 'productivity'):
+                registry.intern('crop', crop)
+    return registry
+
+
+registry = build_registry()
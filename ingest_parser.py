@@ -0,0 +1,128 @@
+"""
+Ingest Parser - Parses and validates bulk mandi price/demand feeds
+
+Accepts NDJSON (one JSON object per line) or CSV with a header row. Each record
+needs district, crop, demand and price; timestamp is optional and defaults to
+the time of ingestion.
+"""
+import csv
+import io
+import json
+import math
+from datetime import datetime
+
+REQUIRED_FIELDS = ['district', 'crop', 'demand', 'price']
+
+MAX_INGEST_ROWS = 50000
+
+
+def detect_format(content_type, format_param=None):
+    """Work out the payload format from a query parameter or content type"""
+    if format_param:
+        return format_param.lower()
+
+    content_type = (content_type or '').lower()
+    if 'csv' in content_type:
+        return 'csv'
+    if 'ndjson' in content_type or 'json' in content_type:
+        return 'ndjson'
+    return None
+
+
+def _iter_ndjson(text):
+    """Yield (row_number, raw_record) pairs from NDJSON text"""
+    for row_number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid JSON: {e}")
+
+
+def _iter_csv(text):
+    """Yield (row_number, raw_record) pairs from CSV text with a header row"""
+    reader = csv.DictReader(io.StringIO(text))
+    # Row numbers count the header as row 1, matching spreadsheet line numbers
+    for row_number, row in enumerate(reader, start=2):
+        yield row_number, row
+
+
+def _parse_number(value, field):
+    """Parse a non-negative finite number"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' must be a number")
+
+    if not math.isfinite(number) or number < 0:
+        raise ValueError(f"'{field}' must be a non-negative number")
+    return number
+
+
+def _parse_timestamp(value, received_at):
+    """Parse an ISO 8601 timestamp, defaulting to the ingestion time"""
+    if value in (None, ''):
+        return received_at
+
+    try:
+        timestamp = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError("'timestamp' must be an ISO 8601 date or datetime")
+
+    # Store naive local-time timestamps like the rest of the data
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+
+def validate_record(raw, received_at):
+    """Validate one raw record and convert it into a data point"""
+    if not isinstance(raw, dict):
+        raise ValueError('Record must be an object')
+
+    missing = [field for field in REQUIRED_FIELDS if raw.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    district = str(raw['district']).strip()
+    crop = str(raw['crop']).strip().lower()
+    timestamp = _parse_timestamp(raw.get('timestamp'), received_at)
+
+    return {
+        'key': f"{district}_{crop}",
+        'year': timestamp.year,
+        'month': timestamp.month,
+        'demand': _parse_number(raw['demand'], 'demand'),
+        'price': _parse_number(raw['price'], 'price'),
+        'timestamp': timestamp.isoformat(),
+        'is_real_time': True
+    }
+
+
+def parse_ingest_payload(text, data_format):
+    """Parse a payload into (records, errors), validating each row"""
+    if data_format == 'csv':
+        rows = _iter_csv(text)
+    elif data_format == 'ndjson':
+        rows = _iter_ndjson(text)
+    else:
+        raise ValueError("Unsupported format, use NDJSON or CSV")
+
+    received_at = datetime.now()
+    records = []
+    errors = []
+
+    for row_number, raw in rows:
+        if len(records) + len(errors) >= MAX_INGEST_ROWS:
+            raise ValueError(f"Payload exceeds the limit of {MAX_INGEST_ROWS} rows")
+
+        try:
+            if isinstance(raw, Exception):
+                raise raw
+            records.append(validate_record(raw, received_at))
+        except ValueError as e:
+            errors.append({'row': row_number, 'error': str(e)})
+
+    return records, errors
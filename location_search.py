@@ -0,0 +1,96 @@
+"""
+Location Search - Prefix index for state/district/city type-ahead
+
+Every state, district and city name is indexed under its full name and under
+each word inside it (so "chinch" finds "Pimpri-Chinchwad"). Keys are kept in
+sorted lists and a prefix query is two binary searches plus a scan over the
+matching slice. Matching is case- and diacritic-insensitive by default. The
+index never changes once built, so ranked results are memoized per query and
+the broad one-letter prefixes are ranked up front.
+"""
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+from functools import lru_cache
+
+MAX_SEARCH_LIMIT = 50
+
+# Ranked results kept per distinct query; type-ahead traffic repeats short prefixes heavily
+QUERY_CACHE_SIZE = 4096
+
+# Lower sorts first: states before districts before cities
+LEVELS = {'state': 0, 'district': 1, 'city': 2}
+
+WORD_SPLIT = re.compile(r"[\s\-/().,']+")
+
+
+def fold(text):
+    """Casefold and strip diacritics, so 'Bélgaum' and 'BELGAUM' both become 'belgaum'"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+class LocationIndex:
+    """Sorted prefix index over the location hierarchy"""
+
+    def __init__(self, locations):
+        self.entries = []
+        for state, districts in locations.items():
+            self._add('state', state, state, None, None)
+            for district, cities in districts.items():
+                self._add('district', district, state, district, None)
+                for city in cities:
+                    self._add('city', city, state, district, city)
+
+        self._folded = self._build_keys(fold)
+        self._exact = self._build_keys(lambda text: text)
+        self._ranked = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._rank)
+
+        for key in set(key[:1] for key in self._folded[0]):
+            self._ranked(key, True, None)
+
+    def _add(self, level, name, state, district, city):
+        self.entries.append({'type': level, 'name': name, 'state': state, 'district': district, 'city': city})
+
+    def _build_keys(self, normalize):
+        """Build sorted (key, is_word, entry_id) triples; full names are is_word=0"""
+        keys = []
+        for entry_id, entry in enumerate(self.entries):
+            name = normalize(entry['name'])
+            keys.append((name, 0, entry_id))
+            # The first word is already covered by the full name
+            for word in [word for word in WORD_SPLIT.split(name) if word][1:]:
+                keys.append((word, 1, entry_id))
+        keys.sort()
+        return [key[0] for key in keys], [(key[1], key[2]) for key in keys]
+
+    def search(self, query, limit=10, folded=True, level=None):
+        """Find locations whose name, or a word in it, starts with the query
+
+        Ranked by exact match, then full-name over word match, then state,
+        district, city, then shorter and alphabetically earlier names.
+        """
+        query = fold(query.strip()) if folded else query.strip()
+        if not query:
+            return []
+        return [self.entries[entry_id] for entry_id in self._ranked(query, folded, level)[:limit]]
+
+    def _rank(self, query, folded, level):
+        """Get the ids of the best MAX_SEARCH_LIMIT matches for a normalized query"""
+        keys, postings = self._folded if folded else self._exact
+        best = {}
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\U0010ffff', lo=start)
+        for i in range(start, end):
+            is_word, entry_id = postings[i]
+            entry = self.entries[entry_id]
+            if level is not None and entry['type'] != level:
+                continue
+            exact = not is_word and keys[i] == query
+            rank = (not exact, is_word, LEVELS[entry['type']], len(entry['name']), entry['name'])
+            if entry_id not in best or rank < best[entry_id]:
+                best[entry_id] = rank
+
+        top = heapq.nsmallest(MAX_SEARCH_LIMIT, best.items(), key=lambda item: item[1])
+        return tuple(entry_id for entry_id, _ in top)
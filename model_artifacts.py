@@ -0,0 +1,98 @@
+"""
+Model Artifacts - Versioned on-disk model bundles for fast cold start
+
+Each bundle is written to its own directory as plain .npy arrays plus a JSON
+manifest, and a LATEST pointer file names the bundle to load. Arrays are
+memory-mapped on load, so every worker process shares the same pages through
+the OS page cache instead of retraining.
+"""
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+
+from ai_predictor import ModelBundle
+
+FORMAT_VERSION = 2
+LATEST_FILE = 'LATEST'
+MANIFEST_FILE = 'manifest.json'
+ARRAYS = ('demand_coef', 'price_coef', 'base_values')
+
+
+def save_bundle(bundle, directory):
+    """Write a bundle to its own version directory and point LATEST at it"""
+    os.makedirs(directory, exist_ok=True)
+    version_dir = os.path.join(directory, bundle.version)
+    tmp_dir = f"{version_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    for name in ARRAYS:
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(getattr(bundle, name)))
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': bundle.version,
+        'trained_at': bundle.trained_at.isoformat(),
+        'training_duration': bundle.training_duration,
+        'training_rows': bundle.training_rows,
+        'data_fingerprint': bundle.data_fingerprint,
+        'base_year': bundle.base_year,
+        'series_keys': bundle.series_keys
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+
+    if os.path.exists(version_dir):
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, version_dir)
+
+    latest_tmp = os.path.join(directory, f"{LATEST_FILE}.{os.getpid()}.tmp")
+    with open(latest_tmp, 'w') as f:
+        f.write(bundle.version)
+    os.replace(latest_tmp, os.path.join(directory, LATEST_FILE))
+
+    _remove_old_versions(directory, keep=bundle.version)
+
+
+def load_latest_bundle(directory):
+    """Load the bundle LATEST points at, or None if there is no usable artifact"""
+    try:
+        with open(os.path.join(directory, LATEST_FILE), 'r') as f:
+            version = f.read().strip()
+
+        version_dir = os.path.join(directory, version)
+        with open(os.path.join(version_dir, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('format_version') != FORMAT_VERSION:
+        return None
+
+    arrays = {
+        name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode='r')
+        for name in ARRAYS
+    }
+
+    return ModelBundle(
+        version=manifest['version'],
+        series_keys=manifest['series_keys'],
+        base_year=manifest['base_year'],
+        trained_at=datetime.fromisoformat(manifest['trained_at']),
+        training_duration=manifest['training_duration'],
+        training_rows=manifest['training_rows'],
+        data_fingerprint=manifest['data_fingerprint'],
+        **arrays
+    )
+
+
+def _remove_old_versions(directory, keep):
+    """Delete bundle directories older than the one being kept"""
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if entry < keep and os.path.isdir(path) and not entry.endswith('.tmp'):
+            # Other workers may still have the old arrays mapped
+            shutil.rmtree(path, ignore_errors=True)
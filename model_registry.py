@@ -0,0 +1,91 @@
+"""
+Model Registry - Per-series seasonal regression models
+
+Every district x crop series gets its own least-squares fit of demand and price
+on month, seasonal (sin/cos) and trend features. Crop-level models pooled over
+all districts, plus one global model, serve series that are unknown or too
+short to fit. Coefficients are returned as dense (n_series x n_features)
+matrices, so a forecast is a row lookup plus a dot product.
+"""
+import numpy as np
+
+GLOBAL_KEY = '*'
+N_FEATURES = 5
+
+# Fewer points than this cannot pin down a seasonal curve reliably
+MIN_SERIES_POINTS = 12
+
+
+def crop_key(crop):
+    """Registry key of the crop-level model"""
+    return f"*_{crop}"
+
+
+def build_design(months, trend):
+    """Build the month/sin/cos/trend/intercept design matrix"""
+    months = np.asarray(months, dtype=np.float64)
+    trend = np.broadcast_to(np.asarray(trend, dtype=np.float64), months.shape)
+    angles = 2 * np.pi * months / 12
+    return np.column_stack([months, np.sin(angles), np.cos(angles), trend, np.ones(len(months))])
+
+
+def _fit_series(work):
+    """Fit demand and price coefficients for a list of (months, trend, demand, price) series"""
+    demand_coefs = np.empty((len(work), N_FEATURES))
+    price_coefs = np.empty((len(work), N_FEATURES))
+
+    for i, (months, trend, demands, prices) in enumerate(work):
+        design = build_design(months, trend)
+        targets = np.column_stack([demands, prices])
+        coefs = np.linalg.lstsq(design, targets, rcond=None)[0]
+        demand_coefs[i] = coefs[:, 0]
+        price_coefs[i] = coefs[:, 1]
+
+    return demand_coefs, price_coefs
+
+
+def _pool(series_list):
+    """Concatenate several series into one pooled series"""
+    return tuple(np.concatenate([series[i] for series in series_list]) for i in range(4))
+
+
+def fit_registry(training_data, base_year):
+    """Fit per-series, per-crop and global models from {key: columns} history
+
+    Returns (series_keys, demand_coef, price_coef, base_values), where row i of
+    each matrix belongs to series_keys[i].
+    """
+    series_keys = []
+    work = []
+    by_crop = {}
+
+    for key in sorted(training_data):
+        columns = training_data[key]
+        if len(columns['month']) < MIN_SERIES_POINTS:
+            continue
+
+        series = (
+            np.asarray(columns['month'], dtype=np.float64),
+            np.asarray(columns['year'], dtype=np.float64) - base_year,
+            np.asarray(columns['demand'], dtype=np.float64),
+            np.asarray(columns['price'], dtype=np.float64)
+        )
+        series_keys.append(key)
+        work.append(series)
+        by_crop.setdefault(key.split('_', 1)[-1], []).append(series)
+
+    for crop in sorted(by_crop):
+        series_keys.append(crop_key(crop))
+        work.append(_pool(by_crop[crop]))
+
+    if not work:
+        raise ValueError("No series has enough history to train on")
+
+    series_keys.append(GLOBAL_KEY)
+    work.append(_pool(work[:len(work) - len(by_crop)]))
+
+    # Fitted serially: each series is a tiny lstsq, and forking from the trainer thread isn't safe
+    demand_coef, price_coef = _fit_series(work)
+
+    base_values = np.array([[series[2].mean(), series[3].mean()] for series in work])
+    return series_keys, demand_coef, price_coef, base_values
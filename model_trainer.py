@@ -0,0 +1,103 @@
+"""
+Model Trainer - Fits AIPredictor models in the background and hot-swaps them
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+
+from model_artifacts import load_latest_bundle, save_bundle
+
+# Ingests trigger a retrain only once this many rows have arrived since the last run...
+INGEST_RETRAIN_ROWS = 10000
+# ...and no sooner than this after it; smaller trickles wait for the 6-hourly retrain
+INGEST_RETRAIN_INTERVAL = timedelta(minutes=30)
+
+
+class ModelTrainer:
+    def __init__(self, ai_predictor, data_manager, artifact_dir=None, max_artifact_age=timedelta(hours=6)):
+        self.ai_predictor = ai_predictor
+        self.data_manager = data_manager
+        self.artifact_dir = artifact_dir or os.path.join(data_manager.data_dir, "models")
+        self.max_artifact_age = max_artifact_age
+        self.status = 'idle'
+        self.last_error = None
+        self.last_trained_at = None
+        self.rows_since_training = 0
+        self._requested = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Load a fresh artifact if there is one, otherwise train in the background"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+        bundle = load_latest_bundle(self.artifact_dir)
+        if bundle is not None and not self.is_stale(bundle):
+            self.ai_predictor.publish(bundle)
+            print(f"Loaded model {bundle.version} from {self.artifact_dir}")
+        else:
+            self.trigger()
+
+    def is_stale(self, bundle):
+        """Check whether a bundle was trained on different data or is too old"""
+        if bundle.data_fingerprint != self.data_manager.get_data_fingerprint():
+            return True
+        return datetime.now() - bundle.trained_at > self.max_artifact_age
+
+    def trigger(self):
+        """Request a retrain; requests made while a run is in progress coalesce"""
+        self._requested.set()
+
+    def notify_ingest(self, rows):
+        """Count newly ingested rows, retraining once enough have arrived since the last run
+
+        Every retrain publishes a new model version, which empties the forecast
+        cache and re-forecasts every active series, so a steady ingest stream
+        must not retrain on every request.
+        """
+        self.rows_since_training += rows
+        if self.rows_since_training < INGEST_RETRAIN_ROWS:
+            return False
+        if self.last_trained_at is not None and datetime.now() - self.last_trained_at < INGEST_RETRAIN_INTERVAL:
+            return False
+        self.trigger()
+        return True
+
+    def _run(self):
+        """Wait for retrain requests and serve them one at a time"""
+        while True:
+            self._requested.wait()
+            self._requested.clear()
+            self.train_now()
+
+    def train_now(self):
+        """Fit new models on the current history and publish them"""
+        self.status = 'training'
+        self.last_trained_at = datetime.now()
+        self.rows_since_training = 0
+        try:
+            data_fingerprint = self.data_manager.get_data_fingerprint()
+            bundle = self.ai_predictor.train(self.data_manager.get_training_data(), data_fingerprint)
+            self.last_error = None
+            print(f"Published model {bundle.version} "
+                  f"(trained on {bundle.training_rows} rows in {bundle.training_duration:.3f}s)")
+            save_bundle(bundle, self.artifact_dir)
+            return bundle
+        except Exception as e:
+            # Keep serving the previous bundle if retraining fails
+            self.last_error = str(e)
+            print(f"Model training failed: {e}")
+            return None
+        finally:
+            self.status = 'idle'
+
+    def describe(self):
+        """Get trainer status and the active model version for /api/health"""
+        bundle = self.ai_predictor.bundle
+        return {
+            'status': self.status,
+            'rows_since_training': self.rows_since_training,
+            'active': bundle.describe() if bundle is not None else None,
+            'last_error': self.last_error
+        }
@@ -2,12 +2,49 @@ import requests
 import random
 from datetime import datetime, timedelta
 import json
+import numpy as np
+
+WILDCARD = 'all'
+
+def get_event_effect(event):
+    """Get the (demand, price) multipliers of an event; None means the series is untouched"""
+    if event['type'] == 'disaster':
+        # Increase demand, increase price
+        return 1.2, 1.3
+    if event['type'] == 'economic':
+        # Affect prices more than demand
+        return None, event.get('impact', 1.1)
+    return None, None
+
+class EventIndex:
+    """Events indexed by (region, crop), with 'all' acting as a wildcard on either side"""
+    
+    def __init__(self, events):
+        self.by_region_crop = {}
+        for order, event in enumerate(events):
+            for region in event['affected_regions']:
+                for crop in event['affected_crops']:
+                    self.by_region_crop.setdefault((region, crop), []).append((order, event))
+    
+    def find(self, regions, crop):
+        """Get events affecting any of the regions for a crop, in the order they were added"""
+        matches = {}
+        for region in [region for region in regions if region] + [WILDCARD]:
+            for crop_key in (crop, WILDCARD):
+                for order, event in self.by_region_crop.get((region, crop_key), ()):
+                    matches[order] = event
+        return [matches[order] for order in sorted(matches)]
 
 class NewsMonitor:
-    def __init__(self):
+    def __init__(self, providers=None):
+        # DataProviders whose poller fetches the news feed; None keeps news simulated
+        self.providers = providers
         self.current_events = []
         self.event_history = []
         self.last_check = datetime.now()
+        self.events_version = 0
+        self._event_index = EventIndex([])
+        self._impact_cache = {}
         
         # Simulate some initial events for demonstration
         self.initialize_sample_events()
@@ -54,21 +91,37 @@ class NewsMonitor:
         for event in sample_events:
             if event['start_date'] <= datetime.now() <= event['end_date']:
                 self.current_events.append(event)
+        
+        self._events_changed()
+    
+    def _events_changed(self):
+        """Rebuild the event index and drop precomposed impacts after events change"""
+        self.events_version += 1
+        self._event_index = EventIndex(self.current_events)
+        self._impact_cache = {}
     
     def check_events(self):
         """Check for new events (simulated for prototype)"""
         current_time = datetime.now()
         
         # Remove expired events
-        self.current_events = [
+        active_events = [
             event for event in self.current_events
             if event['end_date'] > current_time
         ]
+        changed = len(active_events) != len(self.current_events)
+        self.current_events = active_events
         
+        if self.has_news_feed():
+            changed = self.poll_news() > 0 or changed
         # Simulate random new events (for demonstration)
-        if random.random() < 0.1:  # 10% chance of new event
+        elif random.random() < 0.1:  # 10% chance of new event
             new_event = self.generate_random_event()
             self.current_events.append(new_event)
+            changed = True
+        
+        if changed:
+            self._events_changed()
         
         self.last_check = current_time
         return self.current_events
@@ -129,20 +182,46 @@ class NewsMonitor:
     
     def get_events_for_region_crop(self, district, crop):
         """Get events affecting specific region and crop"""
-        relevant_events = []
+        return self._event_index.find([district], crop)
+    
+    def get_event_impact(self, regions, crop, current_month):
+        """Get precomposed per-month multipliers and event labels for a (regions, crop) series"""
+        cache_key = (tuple(regions), crop, current_month)
+        impact = self._impact_cache.get(cache_key)
         
-        for event in self.current_events:
-            # Check if event affects this region
-            if ('all' in event['affected_regions'] or 
-                district in event['affected_regions']):
-                
-                # Check if event affects this crop
-                if ('all' in event['affected_crops'] or 
-                    crop in event['affected_crops']):
-                    
-                    relevant_events.append(event)
-        
-        return relevant_events
+        if impact is None:
+            demand_multiplier = np.ones(12)
+            price_multiplier = np.ones(12)
+            demand_events = [None] * 12
+            price_events = [None] * 12
+            
+            # Events only adjust months that have not happened yet
+            future = slice(current_month - 1, 12)
+            for event in self._event_index.find(regions, crop):
+                demand_effect, price_effect = get_event_effect(event)
+                if demand_effect is not None:
+                    demand_multiplier[future] *= demand_effect
+                    demand_events[future] = [event['name']] * (13 - current_month)
+                if price_effect is not None:
+                    price_multiplier[future] *= price_effect
+                    price_events[future] = [event['name']] * (13 - current_month)
+            
+            demand_multiplier.setflags(write=False)
+            price_multiplier.setflags(write=False)
+            impact = (demand_multiplier, price_multiplier, tuple(demand_events), tuple(price_events))
+            self._impact_cache[cache_key] = impact
+        
+        return impact
+    
+    def get_event_impacts(self, series, current_month):
+        """Stack event impacts for many (regions, crop) series into (n x 12) multiplier matrices"""
+        impacts = [self.get_event_impact(regions, crop, current_month) for regions, crop in series]
+        return {
+            'demand': np.vstack([impact[0] for impact in impacts]) if impacts else np.ones((0, 12)),
+            'price': np.vstack([impact[1] for impact in impacts]) if impacts else np.ones((0, 12)),
+            'demand_events': [impact[2] for impact in impacts],
+            'price_events': [impact[3] for impact in impacts]
+        }
     
     def add_manual_event(self, event_data):
         """Add a manual event for testing purposes"""
@@ -159,8 +238,33 @@ class NewsMonitor:
         }
         
         self.current_events.append(event)
+        self._events_changed()
         return event
     
+    def has_news_feed(self):
+        return self.providers is not None and self.providers.get('news') is not None
+    
+    def fetch_news(self):
+        """Get the latest news from the news feed, or simulated news without one"""
+        if not self.has_news_feed():
+            return self.simulate_news_api_call()
+        
+        # Fetched by the providers' poller thread; check_events runs on the scheduler thread
+        # and must never wait on the upstream
+        return self.providers.latest('news') or []
+    
+    def poll_news(self):
+        """Turn relevant news into events, skipping news already active; returns events added"""
+        active_names = {event['name'] for event in self.current_events}
+        added = 0
+        for event in self.analyze_news_for_events(self.fetch_news()):
+            if event['name'] not in active_names:
+                event['id'] = f"{event['id']}_{added}"
+                self.current_events.append(event)
+                active_names.add(event['name'])
+                added += 1
+        return added
+    
     def simulate_news_api_call(self):
         """Simulate calling a news API (placeholder for real implementation)"""
         # In a real implementation, this would call actual news APIs
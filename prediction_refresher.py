@@ -0,0 +1,177 @@
+"""
+Prediction Refresher - Incremental, sharded refresh of active predictions
+
+Active predictions live in a state store (see state_store.py), either in this
+process or shared by all workers, and are written back with a revision check so
+a refresh never clobbers a newer prediction. Each refresh cycle recomputes only
+the series touched since the previous cycle: series affected by new, changed
+or expired events, and series added since then. A month rollover or a new
+model version touches every series.
+
+With a push broker attached, the months each cycle actually changed are
+published to subscribers of those series.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from id_registry import registry
+from news_monitor import EventIndex
+from push_channel import alerts_message, prediction_message
+from state_store import InProcessStateStore
+
+# Series per work item handed to the refresh pool
+SHARD_SIZE = 256
+
+
+def event_signature(event):
+    """Fields whose change means an event's impact must be re-applied"""
+    return (event['id'], event['type'], event.get('impact'), event['end_date'],
+            tuple(event['affected_regions']), tuple(event['affected_crops']))
+
+
+class PredictionRefresher:
+    """Keeps active predictions up to date with events and model versions"""
+
+    def __init__(self, ai_predictor, news_monitor, state_store=None, max_workers=4, shard_size=SHARD_SIZE,
+                 push_broker=None):
+        self.ai_predictor = ai_predictor
+        self.news_monitor = news_monitor
+        self.store = state_store if state_store is not None else InProcessStateStore()
+        # Receives the months each refresh changed, and event changes, for push subscribers
+        self.push_broker = push_broker
+        self.shard_size = shard_size
+        self.started_at = datetime.now()
+        self._event_signatures = {}
+        self._refreshed_month = None
+        self._refreshed_version = None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='refresh')
+
+    def get(self, key):
+        """Get the active prediction for a (state_id, district_id, city_id, crop_id) series key"""
+        return self.store.get(key)
+
+    def put(self, key, prediction):
+        """Publish a prediction for a series; new series are refreshed on the next cycle"""
+        self.store.put(key, prediction)
+
+    def put_many(self, items):
+        """Publish (key, prediction) pairs in one store write"""
+        self.store.put_many(items)
+
+    @property
+    def last_update(self):
+        """ISO time of the last completed refresh in any worker"""
+        return self.store.get_meta('last_update') or self.started_at.isoformat()
+
+    @property
+    def last_refresh(self):
+        return self.store.get_meta('last_refresh')
+
+    def __len__(self):
+        return len(self.store)
+
+    def invalidate(self):
+        """Recompute every series on the next cycle, e.g. after taking over as leader"""
+        self._refreshed_version = None
+        self._event_signatures = {}
+
+    def _changed_events(self, events):
+        """Get events that are new, changed or expired since the last cycle"""
+        signatures = {event['id']: event_signature(event) for event in events}
+        changed = [event for event in events if self._event_signatures.get(event['id']) != signatures[event['id']]]
+        changed.extend(
+            {'id': signature[0], 'affected_regions': signature[4], 'affected_crops': signature[5]}
+            for event_id, signature in self._event_signatures.items()
+            if event_id not in signatures
+        )
+        self._event_signatures = signatures
+        return changed
+
+    def _touched_keys(self, snapshot, pending, changed):
+        """Work out which series keys need recomputing this cycle"""
+        if (self._refreshed_month != self.ai_predictor.current_month or
+                self._refreshed_version != self.ai_predictor.model_version):
+            return list(snapshot)
+
+        touched = [key for key in snapshot if key in pending]
+        if changed:
+            index = EventIndex(changed)
+            for key in snapshot:
+                if key not in pending:
+                    state, district, city, crop = registry.series_names(key)
+                    if index.find([city, district, state], crop):
+                        touched.append(key)
+        return touched
+
+    def _refresh_shard(self, items):
+        """Recompute one shard of (location, crop, regions) items"""
+        return self.ai_predictor.get_updated_predictions(items, self.news_monitor)
+
+    def refresh(self):
+        """Recompute the touched series in parallel shards and publish a new snapshot"""
+        started = time.perf_counter()
+        self.news_monitor.check_events()
+        self.ai_predictor.refresh_calendar()
+
+        pending = self.store.take_pending()
+        snapshot = self.store.snapshot()
+
+        changed = self._changed_events(self.news_monitor.get_current_events())
+        touched = self._touched_keys(snapshot, pending, changed)
+        names = [registry.series_names(key) for key in touched]
+        items = [(key[:3], crop, [city, district, state]) for key, (state, district, city, crop) in zip(touched, names)]
+
+        shards = [items[i:i + self.shard_size] for i in range(0, len(items), self.shard_size)]
+        try:
+            results = [prediction for shard in self._pool.map(self._refresh_shard, shards) for prediction in shard]
+        except Exception:
+            # The event diff is already consumed, so recompute everything next cycle
+            self._refreshed_version = None
+            raise
+
+        updates = {}
+        for key, (state, district, city, _), updated in zip(touched, names, results):
+            updated.set_location(state, district, city)
+            updates[key] = (snapshot[key], updated)
+        previous = {key: self.store.get(key) for key in updates} if self.push_broker is not None else None
+        # Predictions replaced while this cycle was running keep their newer revision
+        written = self.store.publish(updates)
+        if self.push_broker is not None:
+            self._push_changes(written, updates, previous, changed)
+
+        self._refreshed_month = self.ai_predictor.current_month
+        self._refreshed_version = self.ai_predictor.model_version
+        finished_at = datetime.now().isoformat()
+        last_refresh = {
+            'finished_at': finished_at,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'series_total': len(snapshot),
+            'series_touched': len(touched),
+            'shards': len(shards)
+        }
+        self.store.set_meta('last_update', finished_at)
+        self.store.set_meta('last_refresh', last_refresh)
+        return last_refresh
+
+    def _push_changes(self, written, updates, previous, changed):
+        """Publish the months that changed in each written series, plus event changes"""
+        messages = []
+        if changed:
+            messages.append(alerts_message(changed, 'scheduler'))
+        for key in written:
+            message = prediction_message(updates[key][1], previous[key], 'scheduler')
+            if message is not None:
+                messages.append(message)
+        try:
+            self.push_broker.publish(messages)
+        except Exception as e:
+            # Subscribers miss this cycle's diffs, but the refresh itself succeeded
+            print(f"Publishing refresh changes failed: {e}")
+
+    def stats(self):
+        """Get refresh metrics for /api/health"""
+        return {
+            'backend': type(self.store).__name__,
+            'last_refresh': self.last_refresh
+        }
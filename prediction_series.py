@@ -0,0 +1,150 @@
+"""
+Prediction Series - Compact array-backed representation of one prediction
+
+A prediction is held as one (4 x 12) float array of demand/price values and
+percentages plus shared 12-month event label tuples, instead of 24 dicts with
+repeated keys. It renders to the original row format (`demand_data` /
+`price_data` lists of per-month dicts) or to parallel columnar arrays.
+"""
+import numpy as np
+
+DEMAND, DEMAND_PERCENTAGE, PRICE, PRICE_PERCENTAGE = range(4)
+
+MONTHS = list(range(1, 13))
+
+NO_EVENTS = (None,) * 12
+
+FORMATS = ('rows', 'columnar')
+
+
+class PredictionSeries:
+    """Full-year demand and price prediction for one location and crop"""
+
+    __slots__ = ('district', 'crop', 'year', 'current_month', 'values', 'demand_events', 'price_events',
+                 'base_demand', 'base_price', 'model_version', 'last_updated', 'state', 'city')
+
+    def __init__(self, district, crop, year, current_month, values, base_demand, base_price,
+                 model_version, last_updated, demand_events=NO_EVENTS, price_events=NO_EVENTS,
+                 state=None, city=None):
+        self.district = district
+        self.crop = crop
+        self.year = year
+        self.current_month = current_month
+        self.values = values
+        self.demand_events = tuple(demand_events)
+        self.price_events = tuple(price_events)
+        self.base_demand = base_demand
+        self.base_price = base_price
+        self.model_version = model_version
+        self.last_updated = last_updated
+        self.state = state
+        self.city = city
+
+    def copy(self):
+        """Copy with its own values array, so the copy can be adjusted independently"""
+        return PredictionSeries(
+            self.district, self.crop, self.year, self.current_month, self.values.copy(),
+            self.base_demand, self.base_price, self.model_version, self.last_updated,
+            self.demand_events, self.price_events, self.state, self.city
+        )
+
+    def set_location(self, state, district, city):
+        self.state = state
+        self.district = district
+        self.city = city
+
+    def _metadata(self):
+        return {
+            'state': self.state,
+            'district': self.district,
+            'city': self.city,
+            'crop': self.crop,
+            'year': self.year,
+            'current_month': self.current_month,
+            'base_demand': self.base_demand,
+            'base_price': self.base_price,
+            'model_version': self.model_version,
+            'last_updated': self.last_updated
+        }
+
+    def to_dict(self):
+        """Render in the original format with per-month demand_data/price_data records"""
+        values = self.values.tolist()
+        demand_data = []
+        price_data = []
+        for i in range(12):
+            is_historical = i + 1 < self.current_month
+            demand_data.append({
+                'month': i + 1,
+                'value': values[DEMAND][i],
+                'percentage': values[DEMAND_PERCENTAGE][i],
+                'is_historical': is_historical,
+                'event': self.demand_events[i]
+            })
+            price_data.append({
+                'month': i + 1,
+                'value': values[PRICE][i],
+                'percentage': values[PRICE_PERCENTAGE][i],
+                'is_historical': is_historical,
+                'event': self.price_events[i]
+            })
+
+        data = self._metadata()
+        data['demand_data'] = demand_data
+        data['price_data'] = price_data
+        return data
+
+    def to_columnar(self):
+        """Render as parallel 12-element arrays per field"""
+        return self._columnar(range(12))
+
+    def _columnar(self, indices):
+        """Columnar rendering of the months at the given 0-based indices"""
+        indices = list(indices)
+        values = self.values[:, indices].tolist()
+        data = self._metadata()
+        data['months'] = [i + 1 for i in indices]
+        data['is_historical'] = [i + 1 < self.current_month for i in indices]
+        data['demand'] = {
+            'values': values[DEMAND],
+            'percentages': values[DEMAND_PERCENTAGE],
+            'events': [self.demand_events[i] for i in indices]
+        }
+        data['price'] = {
+            'values': values[PRICE],
+            'percentages': values[PRICE_PERCENTAGE],
+            'events': [self.price_events[i] for i in indices]
+        }
+        return data
+
+    def diff(self, previous):
+        """Columnar rendering of only the months that differ from `previous`, or None if none do
+
+        A month rollover changes every month's is_historical flag, so it sends all months.
+        """
+        if previous is None or previous.current_month != self.current_month:
+            return self.to_columnar()
+
+        changed = np.any(self.values != previous.values, axis=0)
+        changed |= np.array([a != b for a, b in zip(self.demand_events, previous.demand_events)])
+        changed |= np.array([a != b for a, b in zip(self.price_events, previous.price_events)])
+        if not changed.any():
+            return None
+        return self._columnar(np.flatnonzero(changed).tolist())
+
+    def render(self, data_format='rows'):
+        """Render in one of FORMATS"""
+        return self.to_columnar() if data_format == 'columnar' else self.to_dict()
+
+    @classmethod
+    def from_columnar(cls, data):
+        """Rebuild a series from to_columnar() output"""
+        values = np.array([
+            data['demand']['values'], data['demand']['percentages'],
+            data['price']['values'], data['price']['percentages']
+        ])
+        return cls(
+            data['district'], data['crop'], data['year'], data['current_month'], values,
+            data['base_demand'], data['base_price'], data['model_version'], data['last_updated'],
+            data['demand']['events'], data['price']['events'], data.get('state'), data.get('city')
+        )
@@ -0,0 +1,128 @@
+"""
+Price Ranking - District x crop price matrix with top-k rankings
+
+Simulated mandi prices for every district in STATE_DISTRICT_DATA and every
+crop in CROP_BASE_PRICES are held as (district x crop) NumPy matrices, with
+each state's districts in one contiguous row range. A ranking is an
+argpartition over the selected rows, so any k, any set of crops and the
+national view all come from the same snapshot.
+
+Prices are drawn from the seeded simulation for the current time bucket, so
+every worker ranks the same prices until the bucket rolls over.
+"""
+import numpy as np
+
+from crop_data import CROP_BASE_PRICES, STATE_DISTRICT_DATA
+from simulation import Simulation
+
+# Price used for crops without a base price, matching the old per-request behaviour
+DEFAULT_BASE_PRICE = 30
+
+
+class PriceSnapshot:
+    """One consistent set of simulated prices, changes and volumes"""
+
+    def __init__(self, simulation, keys, base_prices, bucket):
+        self.bucket = bucket
+        self.prices = np.round(base_prices * (0.85 + simulation.uniform('ranking.price', keys, bucket) * 0.4), 2)
+        self.changes = np.round((simulation.uniform('ranking.change', keys, bucket) - 0.5) * 15, 2)
+        self.volumes = simulation.randint('ranking.volume', keys, 200, 1500, bucket)
+        self.last_updated = simulation.bucket_start(bucket).isoformat()
+
+
+class PriceRanking:
+    """Top-k district rankings by price, per state or national"""
+
+    def __init__(self, simulation=None):
+        self.simulation = simulation or Simulation()
+        self.states = []
+        self.districts = []
+        self.district_states = []
+        self.state_rows = {}
+        for state, data in STATE_DISTRICT_DATA.items():
+            start = len(self.districts)
+            self.states.append(state)
+            self.districts.extend(data['districts'])
+            self.district_states.extend([state] * len(data['districts']))
+            self.state_rows[state] = slice(start, len(self.districts))
+
+        # The last column serves every crop without a base price
+        self.crops = list(CROP_BASE_PRICES)
+        self.crop_columns = {crop: i for i, crop in enumerate(self.crops)}
+        self.default_column = len(self.crops)
+        self.base_prices = np.array([CROP_BASE_PRICES[crop] for crop in self.crops] + [DEFAULT_BASE_PRICE],
+                                    dtype=np.float64)
+
+        # One entity key per (state, district, crop) cell; the default column is keyed by ''
+        district_keys = [self.simulation.entity(state, district)
+                         for state, district in zip(self.district_states, self.districts)]
+        self.keys = self.simulation.extend(district_keys, self.crops + [''])
+
+        self.snapshot = None
+        self.refresh()
+
+    def refresh(self):
+        """Simulate the current bucket's mandi prices; readers keep the snapshot they started with
+
+        Returns whether a new snapshot was built.
+        """
+        bucket = self.simulation.bucket()
+        if self.snapshot is not None and self.snapshot.bucket == bucket:
+            return False
+        self.snapshot = PriceSnapshot(self.simulation, self.keys, self.base_prices, bucket)
+        return True
+
+    def _column(self, crop):
+        return self.crop_columns.get(crop, self.default_column)
+
+    def top_k(self, crops, k=5, state=None):
+        """Rank districts by price for each crop, within a state or nationally
+
+        Returns {crop: [district records, highest price first]}; an unknown
+        state gives empty rankings.
+        """
+        self.refresh()
+        snapshot = self.snapshot
+        if state is None:
+            rows = slice(0, len(self.districts))
+        elif state in self.state_rows:
+            rows = self.state_rows[state]
+        else:
+            return {crop: [] for crop in crops}
+
+        columns = [self._column(crop) for crop in crops]
+        prices = snapshot.prices[rows][:, columns]
+        n_rows = prices.shape[0]
+        k = min(k, n_rows)
+        if k <= 0 or not columns:
+            return {crop: [] for crop in crops}
+
+        # Partition each column so its k highest prices come first, then order just those k
+        if k < n_rows:
+            top = np.argpartition(-prices, k - 1, axis=0)[:k]
+        else:
+            top = np.tile(np.arange(n_rows)[:, None], (1, len(columns)))
+        order = np.argsort(-np.take_along_axis(prices, top, axis=0), axis=0, kind='stable')
+        top = np.take_along_axis(top, order, axis=0) + rows.start
+
+        rankings = {}
+        for j, (crop, column) in enumerate(zip(crops, columns)):
+            district_rows = top[:, j].tolist()
+            rankings[crop] = [
+                {
+                    'state': self.district_states[row],
+                    'district': self.districts[row],
+                    'current_price': price,
+                    'price_change': change,
+                    'trend': 'up' if change > 0 else 'down',
+                    'market_volume': volume,
+                    'last_updated': snapshot.last_updated
+                }
+                for row, price, change, volume in zip(
+                    district_rows,
+                    snapshot.prices[district_rows, column].tolist(),
+                    snapshot.changes[district_rows, column].tolist(),
+                    snapshot.volumes[district_rows, column].tolist()
+                )
+            ]
+        return rankings
@@ -0,0 +1,203 @@
+"""
+Push Channel - Server-sent events for prediction diffs and alerts
+
+Clients subscribe to topics over one long-lived SSE connection instead of
+polling /api/predict, /api/events and /api/health:
+- prediction:<state>|<district>|<city>|<crop>  months that changed in one prediction
+- alerts                                        events added, changed or expired
+
+Only the scheduler's refresh and /api/manual_adjust publish. Messages go to
+the state store's event log, so with STATE_BACKEND=sqlite every worker reads
+them; each worker then fans them out to its own connections. A message is
+encoded into an SSE frame once and handed to the subscribers of its topic
+only, so idle connections on other topics are never woken. Clients that
+reconnect with Last-Event-ID are replayed what they missed from the log.
+"""
+import threading
+import time
+from collections import deque
+
+from api_response import dumps
+
+ALERTS_TOPIC = 'alerts'
+PREDICTION_PREFIX = 'prediction:'
+
+# Comment line sent on idle connections so proxies keep them open
+HEARTBEAT_SECONDS = 15
+
+# How often a worker checks the shared event log for other workers' messages
+POLL_SECONDS = 1
+
+# Frames buffered per connection; a client that falls further behind skips ahead
+SUBSCRIBER_QUEUE_SIZE = 256
+
+MAX_TOPICS = 100
+
+
+def prediction_topic(state, district, city, crop):
+    return PREDICTION_PREFIX + '|'.join((state, district, city, crop))
+
+
+def is_valid_topic(topic):
+    if topic == ALERTS_TOPIC:
+        return True
+    return topic.startswith(PREDICTION_PREFIX) and len(topic[len(PREDICTION_PREFIX):].split('|')) == 4
+
+
+def prediction_message(prediction, previous, source):
+    """(topic, payload) for the months of a prediction that changed, or None if none did"""
+    changes = prediction.diff(previous)
+    if changes is None:
+        return None
+    changes['source'] = source
+    return prediction_topic(prediction.state, prediction.district, prediction.city, prediction.crop), changes
+
+
+def alerts_message(changed_events, source):
+    """(topic, payload) listing events added or changed and ids of events that expired"""
+    # Expired events are reduced to id, regions and crops by the refresher's event diff
+    updated = [event for event in changed_events if 'name' in event]
+    return ALERTS_TOPIC, {
+        'source': source,
+        'updated': updated,
+        'expired': [event['id'] for event in changed_events if 'name' not in event]
+    }
+
+
+def _frame(seq, topic, data):
+    """Encode one SSE frame; the event name is the topic kind"""
+    kind = 'prediction' if topic.startswith(PREDICTION_PREFIX) else topic
+    return f"id: {seq}\nevent: {kind}\ndata: {data}\n\n".encode('utf-8')
+
+
+class Subscription:
+    """One client connection's topics and pending frames"""
+
+    def __init__(self, topics, since):
+        self.topics = frozenset(topics)
+        # Last event seq before this subscription started receiving live frames
+        self.since = since
+        self.frames = deque(maxlen=SUBSCRIBER_QUEUE_SIZE)
+        self.ready = threading.Event()
+
+    def deliver(self, frame):
+        self.frames.append(frame)
+        self.ready.set()
+
+    def wait(self, timeout):
+        """Wait for frames and take them all; empty on timeout"""
+        self.ready.wait(timeout)
+        self.ready.clear()
+        frames = []
+        while self.frames:
+            frames.append(self.frames.popleft())
+        return frames
+
+
+class PushBroker:
+    """Publishes push messages to the event log and fans them out to local subscribers"""
+
+    def __init__(self, state_store, poll_seconds=POLL_SECONDS):
+        self.store = state_store
+        self.poll_seconds = poll_seconds
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._dispatch_lock = threading.Lock()
+        self._cursor = state_store.last_event_seq()
+        self._poller = None
+
+    def start(self):
+        """Start polling the event log, needed only when other workers publish to it"""
+        if self.store.shared and self._poller is None:
+            self._poller = threading.Thread(target=self._poll, daemon=True, name='push-poller')
+            self._poller.start()
+
+    def _poll(self):
+        while True:
+            try:
+                self.dispatch()
+            except Exception as e:
+                print(f"Push event poll failed: {e}")
+            time.sleep(self.poll_seconds)
+
+    def subscribe(self, topics):
+        # Holding the dispatch lock pins the cursor, so live delivery starts right after `since`
+        with self._dispatch_lock, self._lock:
+            subscription = Subscription(topics, self._cursor)
+            for topic in subscription.topics:
+                # Copy-on-write, so dispatch iterates subscriber sets without the lock
+                subscribers = set(self._subscribers.get(topic, ()))
+                subscribers.add(subscription)
+                self._subscribers[topic] = subscribers
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic, set()) - {subscription}
+                if subscribers:
+                    self._subscribers[topic] = subscribers
+                else:
+                    self._subscribers.pop(topic, None)
+
+    def publish(self, messages):
+        """Append [(topic, payload)] to the event log and deliver them to this worker's subscribers"""
+        if not messages:
+            return
+        self.store.append_events([(topic, dumps(dict(payload, topic=topic)).decode('utf-8'))
+                                  for topic, payload in messages])
+        self.dispatch()
+
+    def dispatch(self):
+        """Deliver events logged since the last dispatch"""
+        with self._dispatch_lock:
+            while True:
+                events = self.store.read_events(self._cursor)
+                if not events:
+                    return
+                subscribers = self._subscribers
+                for seq, topic, data in events:
+                    listeners = subscribers.get(topic)
+                    if listeners:
+                        frame = _frame(seq, topic, data)
+                        for subscription in listeners:
+                            subscription.deliver(frame)
+                self._cursor = events[-1][0]
+
+    def stream(self, topics, last_event_id=None):
+        """Subscribe to topics and yield SSE frames until the client disconnects"""
+        # Subscribing here, not before the response starts, means every subscription is cleaned up
+        subscription = self.subscribe(topics)
+        try:
+            yield f"retry: {POLL_SECONDS * 1000}\n\n".encode('utf-8')
+            if last_event_id is not None:
+                yield from self._replay(subscription, last_event_id)
+
+            while True:
+                frames = subscription.wait(HEARTBEAT_SECONDS)
+                if frames:
+                    yield b''.join(frames)
+                else:
+                    yield b': keepalive\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+    def _replay(self, subscription, last_event_id):
+        """Frames a reconnecting client missed, as far back as the log goes"""
+        after = last_event_id
+        while after < subscription.since:
+            events = self.store.read_events(after)
+            if not events:
+                return
+            for seq, topic, data in events:
+                if seq > subscription.since:
+                    return
+                if topic in subscription.topics:
+                    yield _frame(seq, topic, data)
+            after = events[-1][0]
+
+    def stats(self):
+        with self._lock:
+            connections = len({subscription for subscribers in self._subscribers.values()
+                               for subscription in subscribers})
+            return {'connections': connections, 'topics': len(self._subscribers), 'cursor': self._cursor}
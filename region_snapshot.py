@@ -0,0 +1,70 @@
+"""
+Region Snapshot - Immutable per-region dashboard data rebuilt in the background
+
+Market rates and weather for every catalog region are generated in bulk on a
+fixed interval and published as a RegionSnapshot. A request is a dict lookup
+into the current snapshot; the snapshot is replaced as a whole, never
+mutated, so readers need no locking. Each read carries when its data was
+generated, how old it is and whether refreshes have fallen behind.
+"""
+import os
+import time
+from datetime import datetime
+
+from location_data import INDIAN_LOCATIONS
+
+SNAPSHOT_INTERVAL_SECONDS = int(os.environ.get('DASHBOARD_SNAPSHOT_SECONDS', 60))
+
+# A region is stale once it missed this many refreshes
+STALE_AFTER_INTERVALS = 2
+
+
+def market_regions(locations=INDIAN_LOCATIONS):
+    """Every (state, district) market rates are served for, including partial ones"""
+    regions = [(None, None)]
+    for state, districts in locations.items():
+        regions.append((state, None))
+        regions.extend((state, district) for district in districts)
+    return regions
+
+
+def weather_regions(locations=INDIAN_LOCATIONS):
+    """Every (state, district, city) weather is served for, including partial ones"""
+    regions = [(None, None, None)]
+    for state, districts in locations.items():
+        regions.append((state, None, None))
+        for district, cities in districts.items():
+            regions.append((state, district, None))
+            regions.extend((state, district, city) for city in cities)
+    return regions
+
+
+def staleness(generated_at, interval, source='snapshot', now=None, generated_at_iso=None):
+    """Freshness metadata for data generated at the `generated_at` timestamp"""
+    age = max(0.0, (time.time() if now is None else now) - generated_at)
+    return {
+        'source': source,
+        'generated_at': generated_at_iso or datetime.fromtimestamp(generated_at).isoformat(),
+        'age_seconds': round(age, 1),
+        'stale': age > interval * STALE_AFTER_INTERVALS
+    }
+
+
+class RegionSnapshot:
+    """Values for a fixed set of regions, generated at one point in time"""
+
+    def __init__(self, values, generated_at=None, interval=SNAPSHOT_INTERVAL_SECONDS):
+        self.values = values
+        self.generated_at = time.time() if generated_at is None else generated_at
+        self.interval = interval
+        self.generated_at_iso = datetime.fromtimestamp(self.generated_at).isoformat()
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, region):
+        """Get (value, staleness) for a region, or None if it is not in the snapshot"""
+        value = self.values.get(region)
+        if value is None:
+            return None
+        return value, staleness(self.generated_at, self.interval, generated_at_iso=self.generated_at_iso)
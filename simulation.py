@@ -0,0 +1,116 @@
+"""
+Simulation - Deterministic, seedable values for the simulated dashboard data
+
+Every simulated value is a pure function of (seed, entity, field, time bucket):
+the inputs are hashed together with the splitmix64 mixer and the result is
+mapped to a uniform float. There is no generator state, so the same district
+shows the same price everywhere within a time bucket, in every worker, and a
+whole (district x crop) matrix is generated with a handful of NumPy ops.
+"""
+import hashlib
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_SEED = 20240101
+
+# Values are redrawn once per bucket; override with SIMULATION_BUCKET_SECONDS
+DEFAULT_BUCKET_SECONDS = 300
+
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(x):
+    """splitmix64 finalizer over a uint64 array"""
+    with np.errstate(over='ignore'):
+        z = x + GOLDEN_GAMMA
+        z = (z ^ (z >> np.uint64(30))) * MIX_1
+        z = (z ^ (z >> np.uint64(27))) * MIX_2
+        return z ^ (z >> np.uint64(31))
+
+
+def name_hash(name):
+    """Stable 64-bit hash of a name, identical across processes and restarts"""
+    return int.from_bytes(hashlib.blake2b(str(name).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class Simulation:
+    """Counter-based random values keyed by entity, field and time bucket"""
+
+    def __init__(self, seed=None, bucket_seconds=None):
+        if seed is None:
+            seed = int(os.environ.get('SIMULATION_SEED', DEFAULT_SEED))
+        if bucket_seconds is None:
+            bucket_seconds = int(os.environ.get('SIMULATION_BUCKET_SECONDS', DEFAULT_BUCKET_SECONDS))
+        self.seed = np.uint64(seed)
+        self.bucket_seconds = max(1, bucket_seconds)
+        self._names = {}
+
+    def _name(self, name):
+        # None (e.g. no district given) hashes like an empty name
+        name = '' if name is None else name
+        name_key = self._names.get(name)
+        if name_key is None:
+            name_key = self._names[name] = np.uint64(name_hash(name))
+        return name_key
+
+    def entity(self, *names):
+        """Hash a tuple of names, e.g. (state, district, crop), into an entity key"""
+        key = np.uint64(0)
+        for name in names:
+            key = _mix(key ^ self._name(name))
+        return key
+
+    def extend(self, keys, names):
+        """Entity keys for every (key, name) pair, shaped keys.shape + (len(names),)"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        hashes = np.array([self._name(name) for name in names], dtype=np.uint64)
+        return _mix(keys[..., None] ^ hashes)
+
+    def entities(self, *name_lists):
+        """Entity keys for the cross product of name lists, shaped (len(a), len(b), ...)"""
+        keys = np.zeros((), dtype=np.uint64)
+        for names in name_lists:
+            keys = self.extend(keys, names)
+        return keys
+
+    def row_entities(self, *name_lists):
+        """Entity keys for names taken position-wise from equal-length lists, shaped (n,)
+
+        Matches entity(*names) row by row. Names are hashed without being kept,
+        so request-supplied names don't grow the name cache.
+        """
+        keys = np.zeros(len(name_lists[0]), dtype=np.uint64)
+        for names in name_lists:
+            hashes = np.fromiter((name_hash('' if name is None else name) for name in names),
+                                 dtype=np.uint64, count=len(keys))
+            keys = _mix(keys ^ hashes)
+        return keys
+
+    def bucket(self, now=None):
+        """Index of the time bucket `now` (a Unix timestamp) falls into"""
+        return int((time.time() if now is None else now) // self.bucket_seconds)
+
+    def bucket_start(self, bucket):
+        """Local time a bucket starts at; simulated values are stamped with it"""
+        return datetime.fromtimestamp(bucket * self.bucket_seconds)
+
+    def uniform(self, field, keys, bucket=0):
+        """Uniform floats in [0, 1) for each entity key, one stream per field and bucket"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        salt = _mix(_mix(self.seed ^ self._name(field)) ^ np.uint64(bucket))
+        bits = _mix(keys ^ salt)
+        return (bits >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+    def randint(self, field, keys, low, high, bucket=0):
+        """Integers in [low, high] inclusive"""
+        return low + (self.uniform(field, keys, bucket) * (high - low + 1)).astype(np.int64)
+
+    def choice(self, field, keys, options, bucket=0):
+        """Pick one of options for each entity key"""
+        picks = (self.uniform(field, keys, bucket) * len(options)).astype(np.int64)
+        return np.asarray(options, dtype=object)[picks]
@@ -0,0 +1,320 @@
+"""
+State Store - Shared storage for active predictions across worker processes
+
+InProcessStateStore keeps predictions in a copy-on-write dict and suits a
+single process. SQLiteStateStore keeps them in a WAL-mode SQLite database on
+local disk, so every gunicorn worker on the host sees the same predictions,
+and uses a lease row to elect the one worker that runs the scheduler.
+
+Both also keep a short, sequence-numbered log of push events (prediction diffs
+and alerts) that every worker reads to fan them out to its own subscribers.
+
+Predictions are keyed by series ID tuples from id_registry. Every stored
+prediction carries a revision that increases on each write, so a refresh
+computed from an older snapshot never overwrites a newer prediction.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from id_registry import registry
+from prediction_series import PredictionSeries
+
+# A leader that misses renewals for this long is replaced
+LEASE_SECONDS = 30
+
+
+# Bump when the predictions table layout changes; older tables are dropped
+SCHEMA_VERSION = 2
+
+KEY_SEPARATOR = '|'
+
+# Push events kept for late readers and reconnecting clients
+EVENT_LOG_SIZE = 10000
+
+
+def _encode_key(key):
+    """Persist series keys by name, since IDs of non-catalog names differ between processes"""
+    return KEY_SEPARATOR.join(registry.series_names(key))
+
+
+def _decode_key(text):
+    return registry.series_key(*text.split(KEY_SEPARATOR))
+
+
+def worker_id():
+    """Identify this worker process for leader election"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class InProcessStateStore:
+    """Predictions held in this process only; the process is always the leader"""
+
+    # Other processes never write here, so there is nothing to poll for
+    shared = False
+
+    def __init__(self):
+        self._entries = {}
+        self._pending = set()
+        self._meta = {}
+        self._revision = 0
+        self._events = deque(maxlen=EVENT_LOG_SIZE)
+        self._event_seq = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def put(self, key, prediction):
+        """Store a prediction; keys seen for the first time are marked pending"""
+        self.put_many([(key, prediction)])
+
+    def put_many(self, items):
+        """Store (key, prediction) pairs with a single copy of the entries"""
+        with self._lock:
+            entries = dict(self._entries)
+            for key, prediction in items:
+                if key not in entries:
+                    self._pending.add(key)
+                self._revision += 1
+                entries[key] = (self._revision, prediction)
+            self._entries = entries
+
+    def snapshot(self):
+        """Get {key: revision} for every stored prediction"""
+        return {key: revision for key, (revision, _) in self._entries.items()}
+
+    def take_pending(self):
+        """Get and clear the keys added since the last call"""
+        with self._lock:
+            pending = self._pending
+            self._pending = set()
+        return pending
+
+    def publish(self, updates):
+        """Write {key: (expected_revision, prediction)}, skipping keys written since
+
+        Returns the keys that were written.
+        """
+        written = []
+        with self._lock:
+            entries = dict(self._entries)
+            for key, (expected_revision, prediction) in updates.items():
+                entry = entries.get(key)
+                if entry is None or entry[0] != expected_revision:
+                    continue
+                self._revision += 1
+                entries[key] = (self._revision, prediction)
+                written.append(key)
+            self._entries = entries
+        return written
+
+    def get_meta(self, name):
+        return self._meta.get(name)
+
+    def set_meta(self, name, value):
+        self._meta[name] = value
+
+    def acquire_leadership(self, owner):
+        return True
+
+    def append_events(self, events):
+        """Append (topic, data) push events to the log"""
+        with self._lock:
+            for topic, data in events:
+                self._event_seq += 1
+                self._events.append((self._event_seq, topic, data))
+
+    def read_events(self, after, limit=1000):
+        """Get up to `limit` (seq, topic, data) events with seq greater than `after`"""
+        events = list(self._events)
+        return [event for event in events if event[0] > after][:limit]
+
+    def last_event_seq(self):
+        return self._event_seq
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteStateStore:
+    """Predictions shared by all worker processes through one SQLite file"""
+
+    shared = True
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._lease_expires = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            # Predictions are a cache of model output, so an old layout is simply discarded
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS predictions")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, revision INTEGER NOT NULL, pending INTEGER NOT NULL, data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leader ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+
+    def _connection(self):
+        """Get this thread's connection; sqlite3 connections are not shared across threads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        """Start a write transaction, taking the write lock up front"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute("SELECT data FROM predictions WHERE key = ?", (_encode_key(key),)).fetchone()
+        return PredictionSeries.from_columnar(json.loads(row[0])) if row is not None else None
+
+    def put(self, key, prediction):
+        """Store a prediction; keys seen for the first time are marked pending"""
+        self.put_many([(key, prediction)])
+
+    def put_many(self, items):
+        """Store (key, prediction) pairs in one transaction"""
+        conn = self._transaction()
+        try:
+            conn.executemany(
+                "INSERT INTO predictions (key, revision, pending, data) VALUES (?, 1, 1, ?) "
+                "ON CONFLICT(key) DO UPDATE SET revision = revision + 1, data = excluded.data",
+                [(_encode_key(key), json.dumps(prediction.to_columnar())) for key, prediction in items]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def snapshot(self):
+        """Get {key: revision} for every stored prediction"""
+        rows = self._connection().execute("SELECT key, revision FROM predictions")
+        return {_decode_key(key): revision for key, revision in rows}
+
+    def take_pending(self):
+        """Get and clear the keys added since the last call"""
+        conn = self._transaction()
+        try:
+            pending = {_decode_key(row[0]) for row in conn.execute("SELECT key FROM predictions WHERE pending = 1")}
+            conn.execute("UPDATE predictions SET pending = 0 WHERE pending = 1")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return pending
+
+    def publish(self, updates):
+        """Write {key: (expected_revision, prediction)}, skipping keys written since
+
+        Returns the keys that were written.
+        """
+        written = []
+        conn = self._transaction()
+        try:
+            for key, (revision, prediction) in updates.items():
+                cursor = conn.execute(
+                    "UPDATE predictions SET revision = revision + 1, data = ? WHERE key = ? AND revision = ?",
+                    (json.dumps(prediction.to_columnar()), _encode_key(key), revision)
+                )
+                if cursor.rowcount:
+                    written.append(key)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return written
+
+    def get_meta(self, name):
+        row = self._connection().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set_meta(self, name, value):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, json.dumps(value))
+        )
+
+    def acquire_leadership(self, owner):
+        """Take or renew the scheduler lease; returns whether this owner is the leader"""
+        now = time.time()
+        # Renew only once half the lease has gone, so the leader is not writing every second
+        if now < self._lease_expires - self.lease_seconds / 2:
+            return True
+
+        conn = self._transaction()
+        try:
+            row = conn.execute("SELECT owner, expires_at FROM leader WHERE id = 1").fetchone()
+            is_leader = row is None or row[0] == owner or row[1] < now
+            if is_leader:
+                conn.execute(
+                    "INSERT OR REPLACE INTO leader (id, owner, expires_at) VALUES (1, ?, ?)",
+                    (owner, now + self.lease_seconds)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._lease_expires = now + self.lease_seconds if is_leader else 0
+        return is_leader
+
+    def append_events(self, events):
+        """Append (topic, data) push events to the log, trimming it to EVENT_LOG_SIZE"""
+        conn = self._transaction()
+        try:
+            conn.executemany("INSERT INTO events (topic, data) VALUES (?, ?)", events)
+            conn.execute("DELETE FROM events WHERE seq <= (SELECT MAX(seq) FROM events) - ?", (EVENT_LOG_SIZE,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read_events(self, after, limit=1000):
+        """Get up to `limit` (seq, topic, data) events with seq greater than `after`"""
+        return self._connection().execute(
+            "SELECT seq, topic, data FROM events WHERE seq > ? ORDER BY seq LIMIT ?", (after, limit)
+        ).fetchall()
+
+    def last_event_seq(self):
+        return self._connection().execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+
+def create_state_store(data_dir="data"):
+    """Create the backend named by STATE_BACKEND ('memory' or 'sqlite')"""
+    backend = os.environ.get('STATE_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        return SQLiteStateStore(os.environ.get('STATE_DB', os.path.join(data_dir, 'state.db')))
+    if backend == 'memory':
+        return InProcessStateStore()
+    raise ValueError(f"Unknown STATE_BACKEND '{backend}', use 'memory' or 'sqlite'")
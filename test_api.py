@@ -190,6 +190,73 @@ def test_invalid_inputs():
     print(f"Invalid input tests: {success_count}/{len(test_cases)} successful")
     return success_count == len(test_cases)
 
+def test_ingest():
+    """Test the bulk ingest endpoint with NDJSON and CSV payloads"""
+    print("\nTesting ingest endpoint...")
+    try:
+        ndjson_payload = "\n".join([
+            json.dumps({"district": "Mumbai", "crop": "wheat", "timestamp": "2024-11-02", "demand": 3120.5, "price": 26.4}),
+            json.dumps({"district": "Pune", "crop": "onion", "demand": 2800, "price": 18.2}),
+            json.dumps({"district": "Pune", "crop": "onion", "demand": "not-a-number", "price": 18.2})
+        ])
+        response = requests.post(
+            f"{BASE_URL}/ingest",
+            data=ndjson_payload,
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        if response.status_code != 200:
+            print(f"✗ NDJSON ingest failed: {response.status_code}")
+            print(f"  Response: {response.text}")
+            return False
+        
+        data = response.json()
+        print(f"✓ NDJSON ingest: {data['accepted']} accepted, {data['rejected']} rejected")
+        if data['accepted'] != 2 or data['rejected'] != 1:
+            print("✗ Unexpected accepted/rejected counts")
+            return False
+        
+        csv_payload = "district,crop,timestamp,demand,price\nDelhi,rice,2024-11-05,4100,31.5\n"
+        response = requests.post(
+            f"{BASE_URL}/ingest",
+            data=csv_payload,
+            headers={"Content-Type": "text/csv"}
+        )
+        if response.status_code != 200:
+            print(f"✗ CSV ingest failed: {response.status_code}")
+            return False
+        
+        print(f"✓ CSV ingest: {response.json()['accepted']} accepted")
+        return True
+    except Exception as e:
+        print(f"✗ Ingest error: {e}")
+        return False
+
+def test_batch_prediction():
+    """Test the streaming batch prediction endpoint with a cross-product spec"""
+    print("\nTesting batch prediction endpoint...")
+    try:
+        response = requests.post(
+            f"{BASE_URL}/predict/batch",
+            json={"state": "Maharashtra", "districts": ["Mumbai", "Pune"], "crops": ["wheat", "rice"]},
+            stream=True
+        )
+        if response.status_code != 200:
+            print(f"✗ Batch prediction failed: {response.status_code}")
+            print(f"  Response: {response.text}")
+            return False
+        
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+        predictions = [line for line in lines if 'data' in line]
+        summary = lines[-1].get('summary')
+        print(f"✓ Batch prediction streamed {len(predictions)} predictions")
+        if not summary or summary['predictions'] != len(predictions):
+            print("✗ Missing or inconsistent summary line")
+            return False
+        return True
+    except Exception as e:
+        print(f"✗ Batch prediction error: {e}")
+        return False
+
 def main():
     """Run all tests"""
     print("🌾 Crop Prediction Backend API Tests")
@@ -207,7 +274,7 @@ def main():
     
     # Run tests
     tests_passed = 0
-    total_tests = 6
+    total_tests = 8
     
     if test_health_check():
         tests_passed += 1
@@ -228,6 +295,12 @@ def main():
     if test_invalid_inputs():
         tests_passed += 1
     
+    if test_ingest():
+        tests_passed += 1
+    
+    if test_batch_prediction():
+        tests_passed += 1
+    
     # Summary
     print("\n" + "=" * 50)
     print(f"Test Results: {tests_passed}/{total_tests} tests passed")
@@ -51,6 +51,23 @@ def test_endpoints():
             print(f"Error: {response.text}")
     except Exception as e:
         print(f"Error: {e}")
+    
+    # Test Dashboard Summary
+    print("\n4. Testing Dashboard Summary:")
+    try:
+        response = requests.get(f'{BASE_URL}/api/dashboard/summary?state=Maharashtra&district=Pune&crop=wheat')
+        print(f"Status: {response.status_code}")
+        if response.status_code == 200:
+            data = response.json()
+            sections = [name for name in ('market_rates', 'crop_health', 'weather', 'alerts', 'top_districts')
+                        if name in data]
+            print(f"Sections returned: {', '.join(sections)} in {data.get('duration_ms')}ms")
+            if data.get('partial'):
+                print(f"Missing sections: {data.get('errors')}")
+        else:
+            print(f"Error: {response.text}")
+    except Exception as e:
+        print(f"Error: {e}")
 
 if __name__ == "__main__":
     test_endpoints()
\ No newline at end of file